@@ -0,0 +1,26 @@
+"""add recipes user_id index
+
+Revision ID: 3b1f0c9d2a47
+Revises: aeee544907f0
+Create Date: 2026-10-18 10:12:41.503217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f0c9d2a47'
+down_revision = 'aeee544907f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (user_id, id) serves both user.recipes lookups and keyset pagination;
+    # a separate user_id index would only duplicate its prefix.
+    op.create_index('ix_recipes_user_id_id', 'recipes', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recipes_user_id_id', table_name='recipes')
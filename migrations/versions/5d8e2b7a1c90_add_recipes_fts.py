@@ -0,0 +1,59 @@
+"""add recipes full-text search
+
+Revision ID: 5d8e2b7a1c90
+Revises: 3b1f0c9d2a47
+Create Date: 2026-10-18 11:02:17.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2b7a1c90'
+down_revision = '3b1f0c9d2a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other engines fall back to LIKE in server/search.py.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE recipes_fts USING fts5(
+            title, instructions, content='recipes', content_rowid='id'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts(rowid, title, instructions)
+            VALUES (new.id, new.title, new.instructions);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, title, instructions)
+            VALUES ('delete', old.id, old.title, old.instructions);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_update AFTER UPDATE OF title, instructions ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, title, instructions)
+            VALUES ('delete', old.id, old.title, old.instructions);
+            INSERT INTO recipes_fts(rowid, title, instructions)
+            VALUES (new.id, new.title, new.instructions);
+        END
+    """)
+    op.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS recipes_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS recipes_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS recipes_fts_insert")
+    op.execute("DROP TABLE IF EXISTS recipes_fts")
@@ -0,0 +1,28 @@
+"""add users change_version
+
+Revision ID: 6a0e3f9b4d21
+Revises: 8f4a6d2c0e17
+Create Date: 2026-10-18 15:02:41.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0e3f9b4d21'
+down_revision = '8f4a6d2c0e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('changed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('changed_at')
+        batch_op.drop_column('change_version')
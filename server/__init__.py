@@ -1,19 +1,10 @@
 # server/__init__.py
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_restful import Api
-from .models import db
-
-def create_app():
-    app = Flask(__name__)
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    app.config["SECRET_KEY"] = "secret"
-
-    db.init_app(app)
-    Migrate(app, db)
-    Api(app)
-
-    return app
+def create_app(profile=None, database_uri=None):
+    """Build the API app; see server.app.create_app.
+
+    Imported lazily so `import server.models` and friends don't pay for
+    importing the web app. Unlike `server.app.app`, no default app is built.
+    """
+    from server.app import create_app
+    return create_app(profile, database_uri)
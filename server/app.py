@@ -1,29 +1,43 @@
 # server/app.py
+import os
+import threading
 
-from flask import Flask, request, session, jsonify
+from flask import Flask, g, request, session, jsonify
 from flask_restful import Api, Resource
-from flask_migrate import Migrate
 from flask_cors import CORS
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
 
+from server.bulk import MAX_BULK_BYTES, MAX_BULK_ITEMS, parse_items, bulk_create_recipes
+from server.cache import user_cache, get_user_dict, get_user_profile, load_user_entry
+from server.conditional import change_validators, make_etag, is_not_modified, cache_headers, not_modified
+from server.config import load_config
+from server.extensions import init_extensions
+from server.loading import loader_options
 from server.models import db, User, Recipe
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'supersecretkey'
-
-# Initialize extensions
-db.init_app(app)
-migrate = Migrate(app, db)
-api = Api(app)
-CORS(app)
+from server.query_plans import check_query_plans
+from server.ratelimit import login_throttle
+from server.pagination import parse_limit, decode_cursor, decode_offset, keyset_page
+from server.search import search_recipes
+from server.sessions import regenerate_session
+from server.snapshots import session_snapshots
+from server.serializers import serialize, serialize_many, serializer_for
+from server.streaming import wants_stream, stream_query
+from server.usernames import username_index
+from server.writebehind import group_committer, recipe_row
 
 # Session check before protected routes
-@app.before_request
 def check_if_logged_in():
-    open_routes = ['signup', 'login', 'check_session']
-    if request.endpoint not in open_routes and not session.get('user_id'):
+    # Logout does its own session check so stale sessions can always be cleared.
+    open_routes = ['signup', 'usernameavailable', 'login', 'checksession', 'logout', 'metrics', 'healthz']
+    if request.endpoint in open_routes:
+        return None
+
+    user_id = session.get('user_id')
+    g.current_user = None
+    if user_id:
+        g.current_user = session_snapshots.load(session) or get_user_profile(user_id)
+    if not g.current_user:
         return {'error': '401 Unauthorized'}, 401
 
 # ----------------------------
@@ -38,6 +52,10 @@ class Signup(Resource):
         image_url = data.get('image_url')
         bio = data.get('bio')
 
+        # Reject known duplicates before paying for a bcrypt hash.
+        if isinstance(username, str) and username_index.probably_taken(username):
+            return {'errors': ["Username is already taken."]}, 422
+
         try:
             new_user = User(username=username, image_url=image_url, bio=bio)
             new_user.password_hash = password  # invokes setter
@@ -45,14 +63,26 @@ class Signup(Resource):
             db.session.add(new_user)
             db.session.commit()
 
+            regenerate_session(session)
             session['user_id'] = new_user.id
+            session_snapshots.store(session, new_user)
 
-            return new_user.to_dict(), 201
+            return serialize(new_user), 201
 
         except (ValueError, IntegrityError) as e:
             db.session.rollback()
             return {'errors': [str(e)]}, 422
 
+# ----------------------------
+# Resource: UsernameAvailable
+# ----------------------------
+class UsernameAvailable(Resource):
+    def get(self):
+        username = request.args.get('username', '')
+        if not username.strip():
+            return {'errors': ["Username is required."]}, 422
+        return {'username': username, 'available': not username_index.exists(username)}, 200
+
 # ----------------------------
 # Resource: CheckSession
 # ----------------------------
@@ -62,8 +92,40 @@ class CheckSession(Resource):
         if not user_id:
             return {}, 401
 
-        user = db.session.get(User, user_id)
-        return user.to_dict(), 200
+        if session_snapshots.enabled:
+            profile = session_snapshots.load(session)
+            if not profile:
+                user = db.session.get(User, user_id)
+                if not user:
+                    return {}, 401
+                profile = session_snapshots.store(session, user)
+            # The snapshot only holds the profile, so its version is enough.
+            etag = make_etag('profile', user_id, *session_snapshots.version(session))
+            headers = cache_headers(etag)
+            if is_not_modified(etag):
+                return not_modified(headers)
+            return profile, 200, headers
+
+        # A cached entry carries its own validators; otherwise check them
+        # first, so a 304 costs a two-column lookup instead of a full load.
+        entry = user_cache.get(user_id)
+        if entry is None:
+            validators = change_validators(user_id)
+            if not validators:
+                return {}, 401
+            etag = make_etag('user', user_id, *validators)
+            if is_not_modified(etag, validators[1]):
+                return not_modified(cache_headers(etag, validators[1]))
+            entry = load_user_entry(user_id)
+            if not entry:
+                return {}, 401
+
+        version, changed_at, user_dict = entry
+        etag = make_etag('user', user_id, version, changed_at)
+        headers = cache_headers(etag, changed_at)
+        if is_not_modified(etag, changed_at):
+            return not_modified(headers)
+        return user_dict, 200, headers
 
 # ----------------------------
 # Resource: Login
@@ -74,10 +136,27 @@ class Login(Resource):
         username = data.get('username')
         password = data.get('password')
 
-        user = User.query.filter_by(username=username).first()
-        if user and user.authenticate(password):
+        # Throttled clients are turned away before any DB or bcrypt work. An
+        # admitted attempt counts as failed until the password checks out.
+        attempt, retry_after = login_throttle.reserve(username, request.remote_addr)
+        if retry_after:
+            return {'error': '429 Too Many Requests'}, 429, {'Retry-After': str(retry_after)}
+
+        try:
+            # Recipes are only worth loading once the password checks out.
+            user = User.query.filter_by(username=username).first()
+            authenticated = user is not None and user.authenticate(password)
+        except Exception:
+            login_throttle.release(attempt)
+            raise
+        if authenticated:
+            if db.session.is_modified(user):
+                db.session.commit()
+            login_throttle.succeeded(attempt)
+            regenerate_session(session)
             session['user_id'] = user.id
-            return user.to_dict(), 200
+            session_snapshots.store(session, user)
+            return get_user_dict(user.id), 200
 
         return {'error': '401 Unauthorized'}, 401
 
@@ -88,7 +167,8 @@ class Logout(Resource):
     def delete(self):
         if not session.get('user_id'):
             return {'error': 'Unauthorized'}, 401
-        session.pop('user_id')
+        # Clearing deletes a server-side session outright, revoking it.
+        session.clear()
         return {}, 204
 
 # ----------------------------
@@ -97,12 +177,60 @@ class Logout(Resource):
 class RecipeIndex(Resource):
     def get(self):
         user_id = session.get('user_id')
-        user = db.session.get(User, user_id)
-        return [recipe.to_dict() for recipe in user.recipes], 200
+
+        # Read the change counter before the recipes so a concurrent write
+        # can only make the ETag older than the body, never newer.
+        validators = change_validators(user_id)
+        if not validators:
+            return {'error': '401 Unauthorized'}, 401
+        version, changed_at = validators
+        etag = make_etag('recipes', user_id, version, changed_at)
+        headers = cache_headers(etag, changed_at)
+        if is_not_modified(etag, changed_at):
+            return not_modified(headers)
+
+        user_recipes = Recipe.query.options(*loader_options(Recipe)).filter(Recipe.user_id == user_id)
+
+        if wants_stream():
+            response = stream_query(
+                user_recipes.order_by(Recipe.id),
+                serializer_for(Recipe),
+            )
+            response.headers.update(headers)
+            return response
+
+        # Without paging params keep returning the full list for existing clients.
+        if 'limit' not in request.args and 'after' not in request.args:
+            return serialize_many(user_recipes.order_by(Recipe.id)), 200, headers
+
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after = request.args.get('after')
+            after_id = decode_cursor(after) if after else None
+        except ValueError as e:
+            return {'errors': [str(e)]}, 422
+
+        recipes, next_cursor = keyset_page(
+            user_recipes,
+            Recipe.id,
+            limit,
+            after_id,
+        )
+        return {
+            'recipes': serialize_many(recipes),
+            'next_cursor': next_cursor,
+        }, 200, headers
 
     def post(self):
         data = request.get_json()
 
+        if group_committer.enabled:
+            try:
+                row = recipe_row(data, session.get('user_id'))
+                return group_committer.submit(row), 201
+            except (ValueError, IntegrityError) as e:
+                return {'errors': [str(e)]}, 422
+
         try:
             new_recipe = Recipe(
                 title=data.get('title'),
@@ -114,20 +242,121 @@ class RecipeIndex(Resource):
             db.session.add(new_recipe)
             db.session.commit()
 
-            return new_recipe.to_dict(), 201
+            return serialize(new_recipe), 201
 
         except (ValueError, IntegrityError) as e:
             db.session.rollback()
             return {'errors': [str(e)]}, 422
 
 # ----------------------------
-# Register Resources
+# Resource: RecipeBulk
 # ----------------------------
-api.add_resource(Signup, '/signup')
-api.add_resource(CheckSession, '/check_session')
-api.add_resource(Login, '/login')
-api.add_resource(Logout, '/logout')
-api.add_resource(RecipeIndex, '/recipes')
+class RecipeBulk(Resource):
+    def post(self):
+        if request.content_length and request.content_length > MAX_BULK_BYTES:
+            return {'errors': [f"Request bodies are limited to {MAX_BULK_BYTES} bytes."]}, 413
+        try:
+            items = parse_items(request)
+        except ValueError as e:
+            return {'errors': [str(e)]}, 422
+        if not items:
+            return {'errors': ["No recipes given."]}, 422
+        if len(items) > MAX_BULK_ITEMS:
+            return {'errors': [f"At most {MAX_BULK_ITEMS} recipes per request."]}, 413
+
+        atomic = request.args.get('atomic') in ('1', 'true')
+        try:
+            results, created = bulk_create_recipes(items, session.get('user_id'), atomic)
+        except IntegrityError as e:
+            return {'errors': [str(e)]}, 422
+
+        body = {'created': created, 'failed': len(items) - created, 'results': results}
+        if created == len(items):
+            return body, 201
+        if created:
+            return body, 207
+        return body, 422
+
+# ----------------------------
+# Resource: RecipeSearch
+# ----------------------------
+class RecipeSearch(Resource):
+    def get(self):
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after = request.args.get('after')
+            offset = decode_offset(after) if after else 0
+            recipes, next_cursor = search_recipes(
+                session.get('user_id'), request.args.get('q'), limit, offset
+            )
+        except ValueError as e:
+            return {'errors': [str(e)]}, 422
+
+        return {
+            'recipes': serialize_many(recipes),
+            'next_cursor': next_cursor,
+        }, 200
+
+# ----------------------------
+# Resource: Healthz
+# ----------------------------
+class Healthz(Resource):
+    def get(self):
+        # Reports on the worker that served it; see serve.py.
+        try:
+            db.session.execute(text('SELECT 1'))
+        except OperationalError:
+            db.session.rollback()
+            return {'status': 'unavailable', 'pid': os.getpid()}, 503
+        return {'status': 'ok', 'pid': os.getpid()}, 200
+
+# ----------------------------
+# App factory
+# ----------------------------
+def create_app(profile=None, database_uri=None):
+    app = Flask(__name__)
+    load_config(app, profile, database_uri)
+    app.config['SECRET_KEY'] = 'supersecretkey'
+
+    init_extensions(app)
+    app.before_request(check_if_logged_in)
+
+    api = Api(app, errors={
+        'HashingPoolSaturated': {'error': '503 Service Unavailable', 'status': 503},
+        'GroupCommitTimeout': {'error': '503 Service Unavailable', 'status': 503},
+    })
+    api.add_resource(Signup, '/signup')
+    api.add_resource(UsernameAvailable, '/signup/available')
+    api.add_resource(CheckSession, '/check_session')
+    api.add_resource(Login, '/login')
+    api.add_resource(Logout, '/logout')
+    api.add_resource(RecipeIndex, '/recipes')
+    api.add_resource(RecipeBulk, '/recipes/bulk')
+    api.add_resource(RecipeSearch, '/recipes/search')
+    api.add_resource(Healthz, '/healthz')
+    CORS(app)
+
+    if app.config.get('CHECK_QUERY_PLANS', True):
+        check_query_plans(app)
+
+    return app
+
+
+_default_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # The default app is built on first use of `server.app.app`, so importing
+    # this module for create_app doesn't build (and wire singletons to) a
+    # second app.
+    global app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if 'app' not in globals():
+            app = create_app()
+    return app
+
 
 if __name__ == '__main__':
-    app.run(port=5555, debug=True)
+    create_app().run(port=5555, debug=True)
@@ -0,0 +1,313 @@
+"""ASGI entry point serving the same API as app.py with async SQLAlchemy.
+
+    uvicorn server.asgi:asgi_app --port 5555
+
+Responses and the signed `session` cookie are compatible with the Flask
+app, so the React client works against either server and sessions carry
+over between them. bcrypt runs in a worker thread, which hands it to the
+hashing pool from hashing.py.
+"""
+import contextlib
+
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from server.app import app as flask_app
+from server.cache import PROFILE_COLUMNS, profile_cache, user_cache, user_entry
+from server.config import listen_sqlite_pragmas
+from server.hashing import hasher, HashingPoolSaturated
+from server.models import db, User, Recipe
+from server.pagination import parse_limit, decode_cursor, encode_cursor
+from server.ratelimit import login_throttle
+from server.serializers import serialize, serialize_many
+from server.sessions import ServerSideSessionInterface, generate_sid
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def create_engine_from_flask(app):
+    with app.app_context():
+        url = db.engine.url
+    engine = create_async_engine(
+        url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    )
+    listen_sqlite_pragmas(engine.sync_engine, app.config.get('SQLITE_PRAGMAS'))
+    return engine
+
+
+engine = create_engine_from_flask(flask_app)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+# ----------------------------
+# Session cookie (Flask compatible)
+# ----------------------------
+def load_session(request):
+    interface = flask_app.session_interface
+    cookie = request.cookies.get(interface.get_cookie_name(flask_app))
+    if not cookie:
+        return {}
+    if isinstance(interface, ServerSideSessionInterface):
+        return interface.backend.get(cookie) or {}
+    serializer = interface.get_signing_serializer(flask_app)
+    max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+    try:
+        return serializer.loads(cookie, max_age=max_age)
+    except BadSignature:
+        return {}
+
+
+def save_session(request, response, data, regenerate=False):
+    """Store `data` as the request's session; `regenerate` gives it a new id (at login)."""
+    interface = flask_app.session_interface
+    name = interface.get_cookie_name(flask_app)
+    domain = interface.get_cookie_domain(flask_app)
+    path = interface.get_cookie_path(flask_app)
+
+    if isinstance(interface, ServerSideSessionInterface):
+        sid = request.cookies.get(name)
+        if sid and (regenerate or not data):
+            interface.backend.delete(sid)
+        if regenerate or not sid:
+            sid = generate_sid()
+        if data:
+            interface.backend.set(sid, data)
+        value = sid
+    else:
+        value = interface.get_signing_serializer(flask_app).dumps(dict(data))
+
+    if not data:
+        response.delete_cookie(name, path=path, domain=domain)
+        return response
+    response.set_cookie(
+        name,
+        value,
+        path=path,
+        domain=domain,
+        secure=interface.get_cookie_secure(flask_app),
+        httponly=interface.get_cookie_httponly(flask_app),
+        samesite=interface.get_cookie_samesite(flask_app),
+    )
+    return response
+
+
+def unauthorized():
+    return JSONResponse({'error': '401 Unauthorized'}, 401)
+
+
+async def get_user_dict(db_session, user_id):
+    entry = user_cache.get(user_id)
+    if entry is None:
+        user = await db_session.get(User, user_id, options=[selectinload(User.recipes)])
+        if user is None:
+            return None
+        entry = user_entry(user)
+        user_cache.set(user_id, entry)
+    return entry[2]
+
+
+async def get_user_profile(db_session, user_id):
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        row = (await db_session.execute(
+            select(*PROFILE_COLUMNS).where(User.id == user_id)
+        )).first()
+        if row is None:
+            return None
+        profile = row._asdict()
+        profile_cache.set(user_id, profile)
+    return profile
+
+
+def recipes_query(user_id):
+    return (
+        select(Recipe)
+        .where(Recipe.user_id == user_id)
+        .options(selectinload(Recipe.user))
+        .order_by(Recipe.id)
+    )
+
+
+# ----------------------------
+# Endpoints
+# ----------------------------
+async def signup(request):
+    data = await request.json()
+    try:
+        password_hash = await run_in_threadpool(hasher.hash_password, data.get('password'))
+        new_user = User(
+            username=data.get('username'),
+            image_url=data.get('image_url'),
+            bio=data.get('bio'),
+            _password_hash=password_hash,
+        )
+    except ValueError as e:
+        return JSONResponse({'errors': [str(e)]}, 422)
+
+    async with Session() as db_session:
+        db_session.add(new_user)
+        try:
+            await db_session.commit()
+        except IntegrityError as e:
+            await db_session.rollback()
+            return JSONResponse({'errors': [str(e)]}, 422)
+        await db_session.refresh(new_user, ['recipes'])
+        response = JSONResponse(serialize(new_user), 201)
+
+    return save_session(
+        request, response, dict(load_session(request), user_id=new_user.id), regenerate=True
+    )
+
+
+async def login(request):
+    data = await request.json()
+    username = data.get('username')
+    password = data.get('password')
+    ip = request.client.host if request.client else None
+
+    attempt, retry_after = login_throttle.reserve(username, ip)
+    if retry_after:
+        return JSONResponse(
+            {'error': '429 Too Many Requests'}, 429, headers={'Retry-After': str(retry_after)}
+        )
+
+    async with Session() as db_session:
+        try:
+            user = (await db_session.execute(
+                select(User).where(User.username == username)
+            )).scalar_one_or_none()
+            authenticated = user is not None and await run_in_threadpool(
+                hasher.check_password, user._password_hash, password
+            )
+        except Exception:
+            login_throttle.release(attempt)
+            raise
+
+        if authenticated:
+            if hasher.needs_rehash(user._password_hash):
+                user._password_hash = await run_in_threadpool(hasher.hash_password, password)
+                await db_session.commit()
+            login_throttle.succeeded(attempt)
+            # Recipes are only worth loading once the password checks out.
+            await db_session.refresh(user, ['recipes'])
+            response = JSONResponse(serialize(user), 200)
+            return save_session(
+                request, response, dict(load_session(request), user_id=user.id), regenerate=True
+            )
+
+    return unauthorized()
+
+
+async def check_session(request):
+    user_id = load_session(request).get('user_id')
+    if not user_id:
+        return JSONResponse({}, 401)
+
+    async with Session() as db_session:
+        user_dict = await get_user_dict(db_session, user_id)
+    if not user_dict:
+        return JSONResponse({}, 401)
+    return JSONResponse(user_dict, 200)
+
+
+async def logout(request):
+    data = load_session(request)
+    if not data.get('user_id'):
+        return JSONResponse({'error': 'Unauthorized'}, 401)
+    data.pop('user_id')
+    return save_session(request, Response(status_code=204), data)
+
+
+async def recipes(request):
+    user_id = load_session(request).get('user_id')
+    async with Session() as db_session:
+        if not user_id or not await get_user_profile(db_session, user_id):
+            return unauthorized()
+
+        if request.method == 'POST':
+            return await create_recipe(request, db_session, user_id)
+
+        params = request.query_params
+        if 'limit' not in params and 'after' not in params:
+            rows = (await db_session.scalars(recipes_query(user_id))).all()
+            return JSONResponse(serialize_many(rows), 200)
+
+        try:
+            limit = parse_limit(params.get('limit'))
+            after = params.get('after')
+            after_id = decode_cursor(after) if after else None
+        except ValueError as e:
+            return JSONResponse({'errors': [str(e)]}, 422)
+
+        query = recipes_query(user_id).limit(limit + 1)
+        if after_id is not None:
+            query = query.where(Recipe.id > after_id)
+        rows = (await db_session.scalars(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return JSONResponse({'recipes': serialize_many(rows), 'next_cursor': next_cursor}, 200)
+
+
+async def create_recipe(request, db_session, user_id):
+    data = await request.json()
+    try:
+        new_recipe = Recipe(
+            title=data.get('title'),
+            instructions=data.get('instructions'),
+            minutes_to_complete=data.get('minutes_to_complete'),
+            user_id=user_id,
+        )
+        db_session.add(new_recipe)
+        await db_session.commit()
+    except (ValueError, IntegrityError) as e:
+        await db_session.rollback()
+        return JSONResponse({'errors': [str(e)]}, 422)
+
+    await db_session.refresh(new_recipe, ['user'])
+    return JSONResponse(serialize(new_recipe), 201)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+async def service_unavailable(request, exc):
+    return JSONResponse(
+        {'error': '503 Service Unavailable'}, 503, headers={'Retry-After': '1'}
+    )
+
+
+asgi_app = Starlette(
+    routes=[
+        Route('/signup', signup, methods=['POST']),
+        Route('/login', login, methods=['POST']),
+        Route('/check_session', check_session, methods=['GET']),
+        Route('/logout', logout, methods=['DELETE']),
+        Route('/recipes', recipes, methods=['GET', 'POST']),
+    ],
+    exception_handlers={HashingPoolSaturated: service_unavailable},
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(asgi_app, port=5555)
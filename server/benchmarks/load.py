@@ -0,0 +1,264 @@
+"""HTTP load benchmark for /signup, /login, /check_session and /recipes.
+
+    python -m server.benchmarks.load --mode micro --requests 500 --concurrency 8
+    python -m server.benchmarks.load --mode macro --save-baseline bench.json
+    python -m server.benchmarks.load --mode macro --baseline bench.json
+
+micro drives the Flask test client in-process; macro starts a real
+threaded WSGI server on localhost and talks HTTP to it. Both run against a
+freshly seeded SQLite file in a temp directory, so they work offline and
+never touch app.db. With --baseline the run exits non-zero if any
+endpoint's p95 latency or throughput regresses by more than --tolerance.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ('signup', 'login', 'check_session', 'recipes')
+INSTRUCTIONS = 'Stir the pot slowly and keep tasting until it is completely done.'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load benchmark for the API.")
+    parser.add_argument('--mode', choices=['micro', 'macro'], default='micro')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--recipes-per-user', type=int, default=25)
+    parser.add_argument('--rounds', type=int, default=None, help="bcrypt cost override")
+    parser.add_argument('--baseline', help="fail if results regress against this JSON file")
+    parser.add_argument('--save-baseline', help="write results to this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms vs baseline {previous['p95_ms']:.1f}ms"
+            )
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['rps']:.0f} req/s vs baseline {previous['rps']:.0f} req/s"
+            )
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {previous['errors']}")
+    return regressions
+
+
+# ----------------------------
+# Clients
+# ----------------------------
+class TestClientSession:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code
+
+
+class HTTPSession:
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+# ----------------------------
+# Setup
+# ----------------------------
+def load_app(database_path, rounds):
+    from sqlalchemy import create_engine
+
+    from server.app import create_app
+    from server.hashing import hasher
+    from server.models import db
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    database_uri = f'sqlite:///{database_path}'
+    # Build the schema first so the app starts, and runs its startup
+    # checks, against a migrated database as it does in production.
+    engine = create_engine(database_uri)
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    app = create_app(database_uri=database_uri)
+    if rounds is not None:
+        hasher.log_rounds = rounds
+    return app
+
+
+def seed(app, users, recipes_per_user):
+    from server.hashing import hasher
+    from server.models import db, User, Recipe
+
+    password_hash = hasher.hash_password('password')
+    with app.app_context():
+        for i in range(users):
+            user = User(username=f'bench{i}', _password_hash=password_hash)
+            user.recipes = [
+                Recipe(title=f'Recipe {j}', instructions=INSTRUCTIONS, minutes_to_complete=30)
+                for j in range(recipes_per_user)
+            ]
+            db.session.add(user)
+        db.session.commit()
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+def run_scenario(name, make_session, args):
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    results_lock = threading.Lock()
+
+    def worker(worker_id):
+        session = make_session()
+        username = f'bench{worker_id % args.users}'
+        if name in ('check_session', 'recipes'):
+            session.request('POST', '/login', {'username': username, 'password': 'password'})
+
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            if name == 'signup':
+                call = ('POST', '/signup', {'username': f'new{worker_id}_{i}_{time.time_ns()}',
+                                            'password': 'password'})
+            elif name == 'login':
+                call = ('POST', '/login', {'username': username, 'password': 'password'})
+            elif name == 'check_session':
+                call = ('GET', '/check_session', None)
+            else:
+                call = ('GET', '/recipes', None)
+
+            start = time.perf_counter()
+            status = session.request(*call)
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors[0])
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = load_app(os.path.join(tmp, 'bench.db'), args.rounds)
+        seed(app, args.users, args.recipes_per_user)
+
+        server = None
+        if args.mode == 'macro':
+            server, base_url = start_server(app)
+            make_session = lambda: HTTPSession(base_url)
+        else:
+            make_session = lambda: TestClientSession(app)
+
+        results = {}
+        try:
+            for name in args.scenarios:
+                results[name] = run_scenario(name, make_session, args)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    print(f"{'endpoint':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['errors']:>8}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'mode': args.mode, 'concurrency': args.concurrency, 'results': results},
+                      f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline['mode'], baseline['concurrency']) != (args.mode, args.concurrency):
+            print(f"Baseline was recorded with --mode {baseline['mode']} "
+                  f"--concurrency {baseline['concurrency']}; rerun with the same settings.",
+                  file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Compare the compiled serializers against SerializerMixin.to_dict.
+
+Run from the project root:
+
+    python -m server.benchmarks.serializer_bench --recipes 1000
+"""
+import argparse
+import timeit
+
+from flask import Flask
+
+from server.models import db, User, Recipe
+from server.serializers import serialize, serialize_many
+
+
+def build_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(count):
+    user = User(username='bench', bio='bench user', image_url='http://example.com')
+    user._password_hash = 'not-a-real-hash'
+    db.session.add(user)
+    for i in range(count):
+        db.session.add(Recipe(
+            title=f'Recipe {i}',
+            instructions='Stir the pot slowly and keep tasting until it is done. ' * 2,
+            minutes_to_complete=30,
+            user=user,
+        ))
+    db.session.commit()
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = build_app()
+    with app.app_context():
+        db.create_all()
+        user = seed(args.recipes)
+        recipes = list(user.recipes)
+
+        cases = [
+            ('User (with recipes)',
+             lambda: user.to_dict(), lambda: serialize(user)),
+            (f'{len(recipes)} Recipes (with user)',
+             lambda: [r.to_dict() for r in recipes], lambda: serialize_many(recipes)),
+        ]
+        print(f"{'case':<28}{'mixin ms':>12}{'compiled ms':>14}{'speedup':>10}")
+        for name, mixin, compiled in cases:
+            assert mixin() == compiled()
+            mixin_ms = min(timeit.repeat(mixin, number=1, repeat=args.repeat)) * 1000
+            compiled_ms = min(timeit.repeat(compiled, number=1, repeat=args.repeat)) * 1000
+            print(f"{name:<28}{mixin_ms:>12.2f}{compiled_ms:>14.2f}{mixin_ms / compiled_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Cold-start benchmark: how long `import server.app` takes, and why.
+
+    python -m server.benchmarks.startup
+    python -m server.benchmarks.startup --module server.asgi --runs 10 --top 30
+
+Each run imports the module in a fresh interpreter with `python -X importtime`
+and reports the median total plus the slowest imports by cumulative time.
+It exits non-zero if any of the --forbid modules (migration and seeding
+tooling by default) was imported, since web workers should never load them.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+FORBIDDEN = ('flask_migrate', 'alembic', 'faker')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument('--module', default='server.app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list")
+    parser.add_argument('--forbid', nargs='*', default=list(FORBIDDEN))
+    return parser.parse_args(argv)
+
+
+def parse_importtime(output):
+    """Return {module: cumulative_us} from `-X importtime` stderr output."""
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def forbidden_imports(timings, forbidden):
+    return sorted(
+        name for name in timings
+        if any(name == banned or name.startswith(banned + '.') for banned in forbidden)
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    samples = defaultdict(list)
+    for timings in runs:
+        for name, cumulative in timings.items():
+            samples[name].append(cumulative)
+    medians = {name: statistics.median(values) for name, values in samples.items()}
+
+    print(f"{args.module}: {medians[args.module] / 1000:.1f} ms median over {args.runs} runs")
+    slowest = sorted(medians.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in slowest[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    banned = forbidden_imports(runs[0], args.forbid)
+    if banned:
+        print(f"Imported at startup but should be lazy: {', '.join(banned)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import json
+
+from sqlalchemy import insert
+
+from server.cache import user_cache
+from server.models import db, Recipe, bump_change_version, check_title, check_instructions
+
+MAX_BULK_ITEMS = 1000
+MAX_BULK_BYTES = MAX_BULK_ITEMS * 16 * 1024
+
+
+def parse_items(request):
+    """Read a JSON array, or NDJSON if the body was sent as application/x-ndjson.
+
+    Lines of NDJSON that fail to parse are kept as exceptions so they can be
+    reported against their index instead of failing the whole batch. Reading
+    stops one item past MAX_BULK_ITEMS, which is enough to reject the batch.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items = []
+        for line in request.stream:
+            if not line.strip():
+                continue
+            if len(items) > MAX_BULK_ITEMS:
+                break
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(ValueError("Invalid JSON."))
+        return items
+
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of recipes.")
+    return items
+
+
+def validate_item(item, user_id):
+    """Apply the Recipe validation rules to one item without building a model.
+
+    Returns (row, errors); exactly one of them is None.
+    """
+    if isinstance(item, Exception):
+        return None, [str(item)]
+    if not isinstance(item, dict):
+        return None, ["Each recipe must be an object."]
+
+    title = item.get('title')
+    instructions = item.get('instructions')
+    minutes = item.get('minutes_to_complete')
+
+    errors = []
+    for label, check, value in (
+        ('Title', check_title, title),
+        ('Instructions', check_instructions, instructions),
+    ):
+        if value is not None and not isinstance(value, str):
+            errors.append(f"{label} must be a string.")
+            continue
+        try:
+            check(value)
+        except ValueError as e:
+            errors.append(str(e))
+    if minutes is not None and (not isinstance(minutes, int) or isinstance(minutes, bool)):
+        errors.append("Minutes to complete must be an integer.")
+
+    if errors:
+        return None, errors
+    return {
+        'title': title,
+        'instructions': instructions,
+        'minutes_to_complete': minutes,
+        'user_id': user_id,
+    }, None
+
+
+def bulk_create_recipes(items, user_id, atomic=False):
+    """Validate all items up front, then insert the valid ones in one transaction.
+
+    Returns (results, created_count). With `atomic`, nothing is inserted
+    unless every item is valid.
+    """
+    results = []
+    rows = []
+    for index, item in enumerate(items):
+        row, errors = validate_item(item, user_id)
+        if errors:
+            results.append({'index': index, 'status': 'error', 'errors': errors})
+        else:
+            results.append({'index': index, 'status': 'created'})
+            rows.append(row)
+
+    failed = len(rows) < len(items)
+    if not rows or (atomic and failed):
+        for result in results:
+            if result['status'] == 'created':
+                result['status'] = 'skipped'
+        return results, 0
+
+    statement = insert(Recipe.__table__).returning(
+        Recipe.__table__.c.id, sort_by_parameter_order=True
+    )
+    try:
+        ids = db.session.execute(statement, rows).scalars().all()
+        # Core inserts skip the flush event that bumps the ETag change counter.
+        bump_change_version(db.session.connection(), [user_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Core inserts skip the ORM flush events the user cache listens to.
+    user_cache.invalidate(user_id)
+
+    created = iter(ids)
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = next(created)
+    return results, len(ids)
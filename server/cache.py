@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from server.loading import loader_options
+from server.models import db, User, Recipe
+from server.serializers import serialize
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    With `maxbytes` set, values must be bytes and the cache also evicts to
+    keep their total length under it; a value larger than that isn't kept.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, maxbytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app, prefix):
+        self.maxsize = app.config.get(f'{prefix}_SIZE', self.maxsize)
+        self.ttl = app.config.get(f'{prefix}_TTL', self.ttl)
+        self.maxbytes = app.config.get(f'{prefix}_BYTES', self.maxbytes)
+        self.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._remove(key)
+            if self.maxbytes is not None and len(value) > self.maxbytes:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            if self.maxbytes is not None:
+                self._bytes += len(value)
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self._bytes > self.maxbytes
+            ):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self):
+        """Drop expired entries; returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._data.items() if expires < now]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None and self.maxbytes is not None:
+            self._bytes -= len(entry[1])
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+            if self.maxbytes is not None:
+                stats['bytes'] = self._bytes
+                stats['maxbytes'] = self.maxbytes
+            return stats
+
+
+# (change_version, changed_at, serialized User) keyed by user id. The
+# payload embeds the user's recipes, so recipe writes invalidate their
+# owner's entry too. Invalidation only reaches this process: another
+# worker's writes show up here once the entry expires.
+user_cache = TTLCache(maxsize=4096, ttl=300)
+
+
+def user_entry(user):
+    """Build the user cache entry for a `user` loaded with its recipes."""
+    changed_at = user.changed_at
+    if changed_at is not None:
+        # SQLite's CURRENT_TIMESTAMP is UTC without an offset.
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return user.change_version, changed_at, serialize(user)
+
+
+def load_user_entry(user_id):
+    """Read (change_version, changed_at, user dict) for `user_id` into the cache.
+
+    Returns None if there is no such user.
+    """
+    user = db.session.get(User, user_id, options=loader_options(User))
+    if user is None:
+        return None
+    entry = user_entry(user)
+    user_cache.set(user_id, entry)
+    return entry
+
+
+def get_user_dict(user_id):
+    entry = user_cache.get(user_id) or load_user_entry(user_id)
+    return entry[2] if entry else None
+
+
+# Recipe-free profile dicts keyed by user id, for the login gate: it only
+# needs to know the user exists, so recipe writes leave these entries alone.
+profile_cache = TTLCache(maxsize=4096, ttl=300)
+
+PROFILE_COLUMNS = (User.id, User.username, User.image_url, User.bio)
+
+
+def get_user_profile(user_id):
+    """Return the user's profile (no recipes) for `user_id`, or None."""
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        row = db.session.execute(select(*PROFILE_COLUMNS).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        profile = row._asdict()
+        profile_cache.set(user_id, profile)
+    return profile
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_flushed_users(session, flush_context):
+    stale = session.info.setdefault('stale_user_ids', set())
+    stale_profiles = session.info.setdefault('stale_profile_ids', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            stale.add(obj.id)
+            stale_profiles.add(obj.id)
+        elif isinstance(obj, Recipe):
+            history = inspect(obj).attrs.user_id.history
+            stale.update([obj.user_id, *history.deleted])
+    stale.discard(None)
+    for user_id in stale:
+        user_cache.invalidate(user_id)
+    for user_id in stale_profiles:
+        profile_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    # Invalidate again once the rows are visible, in case another request
+    # re-cached the old value between our flush and commit.
+    for user_id in session.info.pop('stale_user_ids', ()):
+        user_cache.invalidate(user_id)
+    for user_id in session.info.pop('stale_profile_ids', ()):
+        profile_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_users(session):
+    session.info.pop('stale_user_ids', None)
+    session.info.pop('stale_profile_ids', None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _invalidate_bulk_writes(orm_execute_state):
+    # Bulk UPDATE/DELETE bypass the unit of work, so we can't tell which rows
+    # changed; drop everything.
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (User, Recipe):
+            user_cache.clear()
+        if mapper is not None and mapper.class_ is User:
+            profile_cache.clear()
@@ -0,0 +1,133 @@
+import gzip
+import time
+
+from flask import request
+
+from server.cache import TTLCache
+from server.instrumentation import instrumentation
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+ENCODINGS = ('zstd', 'br', 'gzip')
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def available_codecs():
+    """Supported encodings, in the order we prefer them when the client doesn't care."""
+    codecs = {}
+    if zstandard is not None:
+        codecs['zstd'] = _zstd
+    if brotli is not None:
+        codecs['br'] = _brotli
+    codecs['gzip'] = _gzip
+    return codecs
+
+
+class Compressor:
+    """Negotiated gzip/brotli/zstd compression of response bodies.
+
+    Bodies smaller than COMPRESS_MIN_SIZE bytes are sent as is. Responses
+    that carry a strong ETag are compressed once per encoding and kept in
+    an LRU holding at most COMPRESS_CACHE_BYTES of compressed data, so
+    unchanged data isn't recompressed on every request. Each encoding gets
+    its own ETag ("<etag>-<encoding>") as the RFC requires of strong
+    validators.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 500
+        self.levels = dict(DEFAULT_LEVELS)
+        self.codecs = available_codecs()
+        self.cache = TTLCache(maxsize=65536, ttl=3600, maxbytes=16 * 1024 * 1024)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.levels = dict(DEFAULT_LEVELS, **app.config.get('COMPRESS_LEVELS', {}))
+        self.cache.init_app(app, 'COMPRESS_CACHE')
+        app.after_request(self._compress_response)
+
+    def negotiate(self):
+        return request.accept_encodings.best_match(list(self.codecs))
+
+    def compress(self, data, encoding, etag=None):
+        if etag is None:
+            return self._compress(data, encoding)
+        key = (etag, encoding)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self._compress(data, encoding)
+            self.cache.set(key, compressed)
+        return compressed
+
+    def _compress(self, data, encoding):
+        started = time.perf_counter()
+        compressed = self.codecs[encoding](data, self.levels[encoding])
+        instrumentation.record('compress', time.perf_counter() - started)
+        return compressed
+
+    def _compress_response(self, response):
+        if not self.enabled or 'Content-Encoding' in response.headers:
+            return response
+
+        etag, weak = response.get_etag()
+        if weak:
+            etag = None
+        if response.status_code == 304:
+            # Echo the tag of whichever encoded variant the client holds.
+            for encoding in self.codecs:
+                if etag and request.if_none_match.contains(f'{etag}-{encoding}'):
+                    response.set_etag(f'{etag}-{encoding}')
+                    response.vary.add('Accept-Encoding')
+                    break
+            return response
+
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if not encoding:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.set_data(self.compress(data, encoding, etag))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+    def stats(self):
+        return self.cache.stats()
+
+
+compressor = Compressor()
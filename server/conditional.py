@@ -0,0 +1,66 @@
+import hashlib
+from datetime import timezone
+
+from flask import Response, request
+from sqlalchemy import select
+from werkzeug.http import http_date
+
+from server.compression import ENCODINGS
+from server.models import db, User
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def change_validators(user_id):
+    """Return (change_version, changed_at) for `user_id`, or None.
+
+    This is a primary key lookup of two columns, so it is far cheaper than
+    loading and serializing the data the ETag stands for.
+    """
+    row = db.session.execute(
+        select(User.change_version, User.changed_at).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    changed_at = row.changed_at
+    if changed_at is not None:
+        # SQLite's CURRENT_TIMESTAMP is UTC without an offset.
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return row.change_version, changed_at
+
+
+def make_etag(kind, user_id, version, changed_at=None):
+    """Build a strong ETag for `kind` of data owned by `user_id`.
+
+    The query string and Accept header are folded in so that each
+    representation of the resource (pages, streamed formats) gets its own tag.
+    """
+    variant = hashlib.sha1(
+        request.query_string + b'|' + request.headers.get('Accept', '').encode('utf-8')
+    ).hexdigest()[:12]
+    stamp = int(changed_at.timestamp()) if changed_at else 0
+    return f'{kind}-{user_id}-{version}-{stamp}-{variant}'
+
+
+def is_not_modified(etag, last_modified=None):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110).
+    if request.if_none_match:
+        # Compressed responses carry the tag with an encoding suffix.
+        return any(
+            request.if_none_match.contains(tag)
+            for tag in (etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS))
+        )
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def cache_headers(etag, last_modified=None):
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers):
+    return Response(status=304, headers=headers)
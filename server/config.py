@@ -1,22 +1,120 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_bcrypt import Bcrypt
-
-db = SQLAlchemy()
-migrate = Migrate()
-bcrypt = Bcrypt()
-
-def create_app():
-    app = Flask(__name__)
-    
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+import os
+
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URI = 'sqlite:///app.db'
+
+# Named performance profiles. `sqlite_pragmas` run on every new SQLite
+# connection; `engine_options` are passed to create_engine for any backend.
+PROFILES = {
+    # Stock SQLite durability, but wait for locks instead of failing at once.
+    'safe': {
+        'sqlite_pragmas': {
+            'busy_timeout': 5000,
+        },
+        'engine_options': {},
+    },
+    # WAL lets readers run alongside the single writer; NORMAL sync is still
+    # crash-safe in WAL mode and avoids an fsync per commit.
+    'balanced': {
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 64 * 1024 * 1024,
+        },
+        'engine_options': {
+            'pool_size': 5,
+            'max_overflow': 10,
+            'pool_timeout': 10,
+        },
+    },
+    'throughput': {
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 10000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {
+            'pool_size': 20,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_pre_ping': True,
+        },
+    },
+    # For seeding and imports only: a crash can lose recent commits.
+    'bulk_load': {
+        'sqlite_pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'OFF',
+            'busy_timeout': 30000,
+            'cache_size': -256000,
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {},
+    },
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+
+def _is_sqlite(uri):
+    return str(uri).startswith('sqlite')
+
+
+def _is_memory_sqlite(uri):
+    uri = str(uri)
+    return _is_sqlite(uri) and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)
+
+
+def load_config(app, profile=None, database_uri=None):
+    """Apply a performance profile and database URL to `app.config`.
+
+    The URL comes from `database_uri`, then $DATABASE_URL, then the local
+    SQLite file, so the same code can point at a pooled server database.
+    Read replicas come from $DATABASE_REPLICA_URLS (comma-separated).
+    Must be called before `db.init_app(app)`.
+    """
+    profile = profile or os.environ.get('APP_PROFILE', DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {sorted(PROFILES)}.")
+    settings = PROFILES[profile]
+
+    uri = database_uri or os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI
+    engine_options = dict(settings['engine_options'])
+    if _is_memory_sqlite(uri):
+        # In-memory SQLite uses a per-thread pool that takes no sizing options.
+        engine_options = {}
+
+    app.config['APP_PROFILE'] = profile
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SECRET_KEY'] = 'secret'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    app.config['SQLITE_PRAGMAS'] = settings['sqlite_pragmas'] if _is_sqlite(uri) else {}
+    app.config.setdefault('SESSION_BACKEND', os.environ.get('SESSION_BACKEND', 'cookie'))
+    replicas = os.environ.get('DATABASE_REPLICA_URLS')
+    app.config.setdefault('SQLALCHEMY_REPLICA_URIS', replicas.split(',') if replicas else [])
+
+
+def listen_sqlite_pragmas(engine, pragmas):
+    """Run `pragmas` on every connection `engine`'s pool opens."""
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+
 
-    # initialize extensions with app
-    db.init_app(app)
-    migrate.init_app(app, db)
-    bcrypt.init_app(app)
+def install_sqlite_pragmas(app, db):
+    """Run the profile's SQLite pragmas on every connection the pool opens."""
+    with app.app_context():
+        listen_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
 
-    return app
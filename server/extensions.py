@@ -0,0 +1,67 @@
+import click
+
+from server.cache import profile_cache, user_cache
+from server.compression import compressor
+from server.config import install_sqlite_pragmas
+from server.hashing import hasher
+from server.instrumentation import instrumentation
+from server.loading import configure_loading, nplusone
+from server.models import db
+from server.ratelimit import login_throttle
+from server.routing import replica_router
+from server.sessions import init_sessions
+from server.snapshots import session_snapshots
+from server.usernames import username_index
+from server.writebehind import group_committer
+
+
+class MigrateCommands(click.Group):
+    """`flask db`, importing Flask-Migrate (and with it Alembic) only when run.
+
+    Alembic is the single most expensive import in the app and web workers
+    never migrate, so they shouldn't pay for it at startup.
+    """
+
+    def __init__(self, app):
+        super().__init__('db', help="Perform database migrations.")
+        self.app = app
+
+    def _commands(self):
+        if 'migrate' not in self.app.extensions:
+            from flask_migrate import Migrate
+            Migrate(self.app, db)
+        from flask_migrate.cli import db as db_commands
+        return db_commands
+
+    def list_commands(self, ctx):
+        return self._commands().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._commands().get_command(ctx, name)
+
+
+def init_extensions(app):
+    """Bind every extension singleton to `app`, in dependency order."""
+    db.init_app(app)
+    install_sqlite_pragmas(app, db)
+    init_sessions(app, db)
+    replica_router.init_app(app, db)
+    hasher.init_app(app)
+    user_cache.init_app(app, 'USER_CACHE')
+    profile_cache.init_app(app, 'PROFILE_CACHE')
+    login_throttle.init_app(app)
+    session_snapshots.init_app(app)
+    instrumentation.init_app(app, db)
+    nplusone.init_app(app, db)
+    configure_loading(app)
+    compressor.init_app(app)
+    username_index.init_app(app)
+    group_committer.init_app(app)
+
+    instrumentation.register_gauges('hashing', hasher.metrics)
+    instrumentation.register_gauges('user_cache', user_cache.stats)
+    instrumentation.register_gauges('profile_cache', profile_cache.stats)
+    instrumentation.register_gauges('compress_cache', compressor.stats)
+    instrumentation.register_gauges('group_commit', group_committer.stats)
+
+    app.cli.add_command(MigrateCommands(app))
@@ -0,0 +1,185 @@
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt as _bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+from server.instrumentation import record
+
+
+class HashingPoolSaturated(ServiceUnavailable):
+    description = "Authentication service is busy, please retry."
+
+
+def _hash_password(password, rounds, prefix):
+    salt = _bcrypt.gensalt(rounds=rounds, prefix=prefix)
+    return _bcrypt.hashpw(password, salt)
+
+
+def _check_password(pw_hash, password):
+    return hmac.compare_digest(_bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+class HashingService:
+    """Runs bcrypt off the request thread in a bounded process pool.
+
+    At most `max_pending` hashes may be queued or running at once; anything
+    beyond that is rejected with HashingPoolSaturated (a 503) instead of
+    piling up behind the pool. With a pool size of 0 hashing runs inline,
+    which is also the behaviour before `init_app` is called.
+    """
+
+    def __init__(self, app=None):
+        self.pool_size = 0
+        self.max_pending = 0
+        self.timeout = None
+        self.log_rounds = 12
+        self.prefix = b'2b'
+
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'in_flight': 0,
+            'seconds_total': 0.0,
+        }
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pool_size = app.config.get('HASHING_POOL_SIZE', os.cpu_count() or 1)
+        self.max_pending = app.config.get('HASHING_MAX_PENDING', self.pool_size * 4)
+        self.timeout = app.config.get('HASHING_TIMEOUT')
+        self.log_rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.prefix = app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+        if app.config.get('BCRYPT_CALIBRATE'):
+            self.calibrate(
+                app.config.get('BCRYPT_TARGET_SECONDS', 0.25),
+                min_rounds=app.config.get('BCRYPT_MIN_ROUNDS', 10),
+                max_rounds=app.config.get('BCRYPT_MAX_ROUNDS', 16),
+            )
+        self.shutdown()
+        self._slots = threading.BoundedSemaphore(self.max_pending) if self.pool_size else None
+        app.extensions['hashing'] = self
+
+    def hash_password(self, password, rounds=None):
+        if not password:
+            raise ValueError("Password must be non-empty.")
+        if rounds is None:
+            rounds = self.log_rounds
+        pw_hash = self._run(_hash_password, password.encode('utf-8'), rounds, self.prefix)
+        return pw_hash.decode('utf-8')
+
+    def check_password(self, pw_hash, password):
+        if not pw_hash or not password:
+            return False
+        return self._run(_check_password, pw_hash.encode('utf-8'), password.encode('utf-8'))
+
+    def calibrate(self, target_seconds, min_rounds=10, max_rounds=16):
+        """Pick the highest cost whose hash on this host fits in `target_seconds`.
+
+        Each extra round doubles the work, so we stop at the first cost that
+        goes over budget. `min_rounds` is always honoured as a floor.
+        """
+        rounds = min_rounds
+        for candidate in range(min_rounds, max_rounds + 1):
+            start = time.perf_counter()
+            _hash_password(b'calibration', candidate, self.prefix)
+            if time.perf_counter() - start > target_seconds:
+                break
+            rounds = candidate
+        self.log_rounds = rounds
+        return rounds
+
+    def needs_rehash(self, pw_hash):
+        try:
+            return int(pw_hash.split('$')[2]) != self.log_rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def metrics(self):
+        with self._lock:
+            return dict(
+                self._metrics,
+                pool_size=self.pool_size,
+                max_pending=self.max_pending,
+                log_rounds=self.log_rounds,
+            )
+
+    def warmup(self):
+        """Start the pool's processes now, so the first logins don't pay for it."""
+        if not self.pool_size:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            executor = self._executor
+        jobs = [
+            executor.submit(_hash_password, b'warmup', 4, self.prefix)
+            for _ in range(self.pool_size)
+        ]
+        for job in jobs:
+            job.result(timeout=self.timeout)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _run(self, fn, *args):
+        if not self.pool_size:
+            return self._timed(fn, *args)
+
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise HashingPoolSaturated(retry_after=1)
+        return self._timed(self._submit, fn, *args)
+
+    def _submit(self, fn, *args):
+        # Called holding a slot, which is released once the pool is done with
+        # the job; a job we stop waiting for still occupies a process.
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+                executor = self._executor
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._count('timed_out')
+            raise HashingPoolSaturated(retry_after=1)
+
+    def _timed(self, fn, *args):
+        self._count('submitted', in_flight=1)
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            record('bcrypt', elapsed)
+            with self._lock:
+                self._metrics['completed'] += 1
+                self._metrics['in_flight'] -= 1
+                self._metrics['seconds_total'] += elapsed
+
+    def _count(self, key, in_flight=0):
+        with self._lock:
+            self._metrics[key] += 1
+            self._metrics['in_flight'] += in_flight
+
+
+hasher = HashingService()
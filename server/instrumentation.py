@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+PHASES = ('sql', 'bcrypt', 'serialize', 'compress')
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class Instrumentation:
+    """Opt-in per-request timing for endpoints, SQL, bcrypt and serialization.
+
+    Enable with INSTRUMENTATION = True (or APP_INSTRUMENTATION=1). Aggregates
+    are served at /metrics in Prometheus text format and each response gets
+    a Server-Timing header.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self._queries = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self._phase_seconds = defaultdict(float)
+        self._gauges = {}
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get(
+            'INSTRUMENTATION', os.environ.get('APP_INSTRUMENTATION') == '1'
+        )
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+        with app.app_context():
+            self.watch_engine(db.engine)
+
+    def watch_engine(self, engine):
+        """Time statements run on `engine` (the primary, or a read replica)."""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def register_gauges(self, name, collect):
+        """Expose the numeric values of `collect()` as app_<name>_<key> gauges."""
+        self._gauges[name] = collect
+
+    def record(self, phase, seconds):
+        if self.enabled and has_request_context() and 'timings' in g:
+            g.timings[phase] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._queries.clear()
+            self._phase_seconds.clear()
+
+    def _start_request(self):
+        if self.enabled:
+            g.request_started = time.perf_counter()
+            g.timings = dict.fromkeys(PHASES, 0.0)
+            g.query_count = 0
+
+    def _finish_request(self, response):
+        if not self.enabled or 'timings' not in g:
+            return response
+
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        labels = f'endpoint="{endpoint}",method="{request.method}"'
+        with self._lock:
+            self._latency[labels].observe(elapsed)
+            self._queries[labels].observe(g.query_count)
+            for phase, seconds in g.timings.items():
+                self._phase_seconds[(labels, phase)] += seconds
+
+        timing = [
+            f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in g.timings.items()
+        ]
+        timing[0] += f';desc="{g.query_count} queries"'
+        timing.append(f'total;dur={elapsed * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timing)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's context, so a statement that fails leaves
+        # nothing behind to be mistaken for the next one's start.
+        if self.enabled and context is not None:
+            context.query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'query_started', None)
+        if not self.enabled or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if has_request_context() and 'timings' in g:
+            g.timings['sql'] += elapsed
+            g.query_count += 1
+
+    def _metrics_view(self):
+        if not self.enabled:
+            return {'error': '404 Not Found'}, 404
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def render(self):
+        lines = ['# TYPE app_request_duration_seconds histogram']
+        with self._lock:
+            for labels, histogram in sorted(self._latency.items()):
+                lines += histogram.render('app_request_duration_seconds', labels)
+            lines.append('# TYPE app_request_sql_queries histogram')
+            for labels, histogram in sorted(self._queries.items()):
+                lines += histogram.render('app_request_sql_queries', labels)
+            lines.append('# TYPE app_phase_seconds_total counter')
+            for (labels, phase), seconds in sorted(self._phase_seconds.items()):
+                lines.append(f'app_phase_seconds_total{{{labels},phase="{phase}"}} {seconds}')
+
+        for name, collect in sorted(self._gauges.items()):
+            for key, value in sorted(collect().items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f'# TYPE app_{name}_{key} gauge')
+                    lines.append(f'app_{name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
+
+
+def record(phase, seconds):
+    instrumentation.record(phase, seconds)
@@ -0,0 +1,112 @@
+import os
+import re
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, lazyload, raiseload, selectinload
+
+STRATEGIES = {
+    'select': lazyload,
+    'selectin': selectinload,
+    'joined': joinedload,
+    'raise': raiseload,
+}
+
+# Relationship loading per endpoint; '*' applies everywhere unless an
+# endpoint overrides the same relationship. Override with EAGER_LOADING.
+DEFAULT_LOADING = {
+    '*': {
+        'User.recipes': 'selectin',
+        'Recipe.user': 'joined',
+    },
+}
+
+_loading = {key: dict(value) for key, value in DEFAULT_LOADING.items()}
+
+
+def configure_loading(app):
+    overrides = app.config.get('EAGER_LOADING', {})
+    _loading.clear()
+    for endpoint in set(DEFAULT_LOADING) | set(overrides):
+        _loading[endpoint] = dict(DEFAULT_LOADING.get(endpoint, {}), **overrides.get(endpoint, {}))
+
+
+def loader_options(model, endpoint=None):
+    """Loader options for `model`'s relationships on `endpoint` (default: this request's).
+
+    Pass the result to `.options(*...)` on any query whose rows get
+    serialized, so related rows come from one query instead of one per row.
+    """
+    if endpoint is None and has_request_context():
+        endpoint = request.endpoint
+    settings = dict(_loading.get('*', {}), **_loading.get(endpoint, {}))
+
+    options = []
+    for path, strategy in settings.items():
+        class_name, key = path.split('.')
+        if class_name != model.__name__:
+            continue
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown loading strategy {strategy!r} for {path}.")
+        options.append(STRATEGIES[strategy](getattr(model, key)))
+    return options
+
+
+# ----------------------------
+# N+1 detection
+# ----------------------------
+class NPlusOneDetected(RuntimeError):
+    pass
+
+
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def statement_shape(statement):
+    # Expanded IN lists vary in length with the data, not the code path.
+    return _IN_LIST.sub('(?)', ' '.join(statement.split()))
+
+
+class NPlusOneDetector:
+    """Fails a request that runs the same statement more than `threshold` times.
+
+    Meant for tests and development: enable with NPLUSONE_DETECT = True (or
+    APP_DETECT_NPLUSONE=1). Identical SQL text with different parameters is
+    what a lazy load inside a loop looks like.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 10
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get(
+            'NPLUSONE_DETECT', os.environ.get('APP_DETECT_NPLUSONE') == '1'
+        )
+        self.threshold = app.config.get('NPLUSONE_THRESHOLD', 10)
+        app.before_request(self._start_request)
+
+        with app.app_context():
+            self.watch_engine(db.engine)
+
+    def watch_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def _start_request(self):
+        if self.enabled:
+            g.statement_counts = Counter()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not self.enabled or not has_request_context() or 'statement_counts' not in g:
+            return
+        shape = statement_shape(statement)
+        g.statement_counts[shape] += 1
+        if g.statement_counts[shape] > self.threshold:
+            raise NPlusOneDetected(
+                f"{request.endpoint} ran this statement more than {self.threshold} "
+                f"times; add an eager loader (see loading.py):\n{shape}"
+            )
+
+
+nplusone = NPlusOneDetector()
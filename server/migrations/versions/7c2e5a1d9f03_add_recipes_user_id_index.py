@@ -0,0 +1,26 @@
+"""add recipes user_id index
+
+Revision ID: 7c2e5a1d9f03
+Revises: 9348a2f558f8
+Create Date: 2026-10-18 10:12:41.503217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5a1d9f03'
+down_revision = '9348a2f558f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (user_id, id) serves both user.recipes lookups and keyset pagination;
+    # a separate user_id index would only duplicate its prefix.
+    op.create_index('ix_recipes_user_id_id', 'recipes', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recipes_user_id_id', table_name='recipes')
@@ -0,0 +1,26 @@
+"""add users profile_version
+
+Revision ID: c3d9b0e5f2a8
+Revises: a41f6c3e8b25
+Create Date: 2026-10-18 12:20:05.774301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9b0e5f2a8'
+down_revision = 'a41f6c3e8b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('profile_version')
@@ -1,12 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import validates
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.exc import IntegrityError
-from flask_bcrypt import Bcrypt
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+from server.hashing import hasher
+from server.routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 class User(db.Model, SerializerMixin):
@@ -17,10 +19,19 @@ class User(db.Model, SerializerMixin):
     _password_hash = db.Column(db.String, nullable=False)
     image_url = db.Column(db.String)
     bio = db.Column(db.String)
+    # Bumped whenever the public profile changes; see PROFILE_FIELDS.
+    profile_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on any write to the user or their recipes; drives ETags.
+    change_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    changed_at = db.Column(db.DateTime, default=func.current_timestamp())
 
     recipes = db.relationship('Recipe', backref='user', cascade='all, delete-orphan')
 
-    serialize_rules = ('-recipes.user', '-_password_hash',)
+    serialize_rules = (
+        '-recipes.user', '-_password_hash', '-profile_version', '-change_version', '-changed_at',
+    )
+
+    PROFILE_FIELDS = ('username', 'image_url', 'bio')
 
     def __repr__(self):
         return f"<User {self.username}>"
@@ -31,10 +42,15 @@ class User(db.Model, SerializerMixin):
 
     @password_hash.setter
     def password_hash(self, password):
-        self._password_hash = bcrypt.generate_password_hash(password.encode('utf-8')).decode('utf-8')
+        self._password_hash = hasher.hash_password(password)
 
     def authenticate(self, password):
-        return bcrypt.check_password_hash(self._password_hash, password.encode('utf-8'))
+        if not hasher.check_password(self._password_hash, password):
+            return False
+        # Upgrade hashes made with an older cost factor while we have the plaintext.
+        if hasher.needs_rehash(self._password_hash):
+            self.password_hash = password
+        return True
 
     @validates("username")
     def validate_username(self, key, value):
@@ -49,11 +65,58 @@ class User(db.Model, SerializerMixin):
         return value
 
 
+@event.listens_for(User, 'before_update')
+def bump_profile_version(mapper, connection, user):
+    state = db.inspect(user)
+    if any(state.attrs[field].history.has_changes() for field in User.PROFILE_FIELDS):
+        user.profile_version = (user.profile_version or 0) + 1
+
+
+def bump_change_version(connection, user_ids=None):
+    """Mark `user_ids` (or every user, if None) as changed.
+
+    Runs on `connection` so the bump commits or rolls back with the write.
+    """
+    users = User.__table__
+    statement = update(users).values(
+        change_version=users.c.change_version + 1,
+        changed_at=func.current_timestamp(),
+    )
+    if user_ids is not None:
+        user_ids = set(user_ids) - {None}
+        if not user_ids:
+            return
+        statement = statement.where(users.c.id.in_(user_ids))
+    connection.execute(statement)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed_change_versions(session, flush_context):
+    changed = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and session.is_modified(obj):
+            changed.add(obj.id)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Recipe):
+            changed.update([obj.user_id, *db.inspect(obj).attrs.user_id.history.deleted])
+    bump_change_version(session.connection(), changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_bulk_change_versions(orm_execute_state):
+    # Bulk UPDATE/DELETE don't say which rows they touch; bump everyone.
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (User, Recipe):
+            bump_change_version(orm_execute_state.session.connection())
+
+
 class Recipe(db.Model, SerializerMixin):
     __tablename__ = 'recipes'
 
     __table_args__ = (
         db.CheckConstraint('length(instructions) >= 50', name='instructions_length_check'),
+        db.Index('ix_recipes_user_id_id', 'user_id', 'id'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -69,15 +132,26 @@ class Recipe(db.Model, SerializerMixin):
 
     @validates("title")
     def validate_title(self, key, value):
-        if not value or value.strip() == "":
-            raise ValueError("Title is required.")
-        return value
+        return check_title(value)
 
     @validates("instructions")
     def validate_instructions(self, key, value):
-        if not value or len(value.strip()) < 50:
-            raise ValueError("Instructions must be at least 50 characters.")
-        return value
+        return check_instructions(value)
+
+
+# Recipe validation rules, shared by the validators above and bulk inserts
+# that skip the ORM.
+
+def check_title(value):
+    if not value or value.strip() == "":
+        raise ValueError("Title is required.")
+    return value
+
+
+def check_instructions(value):
+    if not value or len(value.strip()) < 50:
+        raise ValueError("Instructions must be at least 50 characters.")
+    return value
 
 
 # Optional helper functions for testing or debugging
@@ -0,0 +1,66 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id):
+    payload = json.dumps({'id': last_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('utf-8').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')))
+        return int(payload['id'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("Limit must be an integer.")
+    if limit < 1:
+        raise ValueError("Limit must be at least 1.")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_page(query, column, limit, after_id=None):
+    """Return (rows, next_cursor) for the page of `query` following `after_id`.
+
+    One extra row is fetched so we know whether another page exists without
+    issuing a COUNT.
+    """
+    if after_id is not None:
+        query = query.filter(column > after_id)
+    rows = query.order_by(column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+
+def encode_offset(offset):
+    payload = json.dumps({'offset': offset}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('utf-8').rstrip('=')
+
+
+def decode_offset(cursor):
+    """Decode a cursor for result sets ordered by rank rather than id."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')))
+        offset = int(payload['offset'])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if offset < 0:
+        raise ValueError("Invalid cursor.")
+    return offset
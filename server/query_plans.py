@@ -0,0 +1,62 @@
+import logging
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from server.models import db, User, Recipe
+
+logger = logging.getLogger(__name__)
+
+
+def hot_queries():
+    """The statements app.py runs on every request, keyed by a short name."""
+    return {
+        'user by id': select(User).where(User.id == 1),
+        'user by username': select(User).where(User.username == 'x'),
+        'recipes by user': select(Recipe).where(Recipe.user_id == 1),
+        'recipes page': select(Recipe)
+            .where(Recipe.user_id == 1, Recipe.id > 1)
+            .order_by(Recipe.id)
+            .limit(20),
+    }
+
+
+def _is_full_scan(detail):
+    # SQLite reports "SCAN <table>" for a full table scan and
+    # "SCAN <table> USING [COVERING] INDEX ..." for an index walk.
+    return detail.startswith('SCAN') and 'USING' not in detail
+
+
+def find_full_scans(connection):
+    """Return {query name: [plan lines]} for hot queries that scan a whole table."""
+    scans = {}
+    for name, statement in hot_queries().items():
+        sql = str(statement.compile(
+            dialect=connection.dialect,
+            compile_kwargs={'literal_binds': True},
+        ))
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        details = [row[-1] for row in rows if _is_full_scan(row[-1])]
+        if details:
+            scans[name] = details
+    return scans
+
+
+def check_query_plans(app):
+    """Log a warning for each hot-path query that does a full table scan."""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return {}
+        try:
+            with db.engine.connect() as connection:
+                scans = find_full_scans(connection)
+        except OperationalError as e:
+            logger.warning("Skipping query plan check: %s", e)
+            return {}
+
+    for name, details in scans.items():
+        logger.warning(
+            "Hot query %r does a full table scan (%s); is a migration missing?",
+            name, '; '.join(details),
+        )
+    return scans
@@ -0,0 +1,168 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class LocalBackend:
+    """In-process sliding-window storage: a deque of hit timestamps per key.
+
+    A backend shared across workers (e.g. Redis sorted sets, with reserve
+    as a Lua script) only needs the same public methods, each atomic.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._since_sweep = 0
+
+    def add(self, key, now, window):
+        with self._lock:
+            hits = self._hits.setdefault(key, deque())
+            hits.append(now)
+            self._trim(hits, now - window)
+            self._since_sweep += 1
+            if self._since_sweep >= self.SWEEP_EVERY:
+                self._sweep(now - window)
+            return len(hits)
+
+    def reserve(self, key, now, window, limit):
+        """Add a hit at `now` if `key` has fewer than `limit` in the window.
+
+        Returns (True, None) if the hit was added, else (False, oldest hit).
+        """
+        with self._lock:
+            hits = self._hits.setdefault(key, deque())
+            self._trim(hits, now - window)
+            if len(hits) >= limit:
+                return False, hits[0]
+            hits.append(now)
+            self._since_sweep += 1
+            if self._since_sweep >= self.SWEEP_EVERY:
+                self._sweep(now - window)
+            return True, None
+
+    def remove(self, key, now):
+        """Take back the hit `reserve` added at `now`, if it is still there."""
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits and now in hits:
+                hits.remove(now)
+
+    def oldest(self, key, now, window):
+        """Return (hit count, oldest hit) for `key` within the window."""
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0, None
+            self._trim(hits, now - window)
+            if not hits:
+                del self._hits[key]
+                return 0, None
+            return len(hits), hits[0]
+
+    def clear(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def _trim(self, hits, cutoff):
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+
+    def _sweep(self, cutoff):
+        # Drop keys whose hits have all aged out so memory stays bounded.
+        self._since_sweep = 0
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
+
+
+class SlidingWindowLimiter:
+
+    def __init__(self, limit, window, backend=None):
+        self.limit = limit
+        self.window = window
+        self.backend = backend or LocalBackend()
+
+    def retry_after(self, key, now=None):
+        """Seconds until `key` may try again, or 0 if it is under the limit."""
+        now = time.monotonic() if now is None else now
+        count, oldest = self.backend.oldest(key, now, self.window)
+        if count < self.limit:
+            return 0
+        return max(1, math.ceil(oldest + self.window - now))
+
+    def hit(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        return self.backend.add(key, now, self.window)
+
+    def reserve(self, key, now=None):
+        """Count a hit for `key` unless it is at the limit.
+
+        Returns 0 if the hit was counted, else the seconds until `key` may
+        try again. Checking and counting in one step keeps a concurrent
+        burst from slipping past the limit.
+        """
+        now = time.monotonic() if now is None else now
+        added, oldest = self.backend.reserve(key, now, self.window, self.limit)
+        if added:
+            return 0
+        return max(1, math.ceil(oldest + self.window - now))
+
+    def release(self, key, now):
+        """Take back the hit reserved for `key` at `now`."""
+        self.backend.remove(key, now)
+
+    def reset(self, key):
+        self.backend.clear(key)
+
+
+class LoginThrottle:
+    """Counts failed logins per username and per client IP.
+
+    Configured with LOGIN_USER_LIMIT / LOGIN_IP_LIMIT failures per
+    LOGIN_LIMIT_WINDOW seconds.
+    """
+
+    def __init__(self, backend=None):
+        self.by_username = SlidingWindowLimiter(5, 60, backend)
+        self.by_ip = SlidingWindowLimiter(50, 60, backend)
+
+    def init_app(self, app, backend=None):
+        window = app.config.get('LOGIN_LIMIT_WINDOW', 60)
+        backend = backend or LocalBackend()
+        self.by_username = SlidingWindowLimiter(app.config.get('LOGIN_USER_LIMIT', 5), window, backend)
+        self.by_ip = SlidingWindowLimiter(app.config.get('LOGIN_IP_LIMIT', 50), window, backend)
+
+    def reserve(self, username, ip):
+        """Count a login attempt as failed before it is checked.
+
+        Returns (attempt, retry_after): retry_after is 0 if the attempt may
+        go ahead, in which case pass `attempt` to succeeded() or release()
+        once its outcome is known; a failed attempt needs nothing more.
+        """
+        now = time.monotonic()
+        attempt = (f'user:{username}', f'ip:{ip}', now)
+        retry_after = self.by_username.reserve(attempt[0], now)
+        if retry_after:
+            return None, retry_after
+        retry_after = self.by_ip.reserve(attempt[1], now)
+        if retry_after:
+            self.by_username.release(attempt[0], now)
+            return None, retry_after
+        return attempt, 0
+
+    def succeeded(self, attempt):
+        user_key, ip_key, now = attempt
+        self.by_username.reset(user_key)
+        self.by_ip.release(ip_key, now)
+
+    def release(self, attempt):
+        """Forget an attempt that was never checked, e.g. because hashing failed."""
+        user_key, ip_key, now = attempt
+        self.by_username.release(user_key, now)
+        self.by_ip.release(ip_key, now)
+
+
+login_throttle = LoginThrottle()
@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from server.models import User, Recipe
-from . import db
+from server.models import db, User, Recipe
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -0,0 +1,108 @@
+import os
+import random
+import time
+
+from flask import request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Delete, Insert, Update, create_engine
+from sqlalchemy.engine import make_url
+
+from server.config import listen_sqlite_pragmas
+from server.instrumentation import instrumentation
+from server.loading import nplusone
+
+STICKY_KEY = 'read_primary_until'
+
+# (endpoint, method) pairs that only read, and so may be served by a replica.
+READ_ROUTES = {
+    ('checksession', 'GET'),
+    ('recipeindex', 'GET'),
+    ('recipesearch', 'GET'),
+    ('login', 'POST'),
+}
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to a replica when the request allows it; everything else to the primary.
+
+    Once the session has written it stays on the primary, so a request
+    always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            # A bare connection() request (no clause) may be used for anything.
+            if self._flushing or clause is None or isinstance(clause, (Insert, Update, Delete)):
+                self.info['wrote'] = True
+            elif self.info.get('use_replica') and not self.info.get('wrote'):
+                return replica_router.choose()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Routes read-only requests to SQLALCHEMY_REPLICA_URIS.
+
+    After a request writes, the user's session is pinned to the primary for
+    REPLICA_STICKY_SECONDS so they see their own writes despite replica lag.
+    For local testing a copy of the SQLite file works as a replica.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.engines = []
+        self.read_routes = set(READ_ROUTES)
+        self.sticky_seconds = 5
+
+    def init_app(self, app, db):
+        self.db = db
+        self.dispose()
+        self.engines = [
+            self._create_engine(app, uri) for uri in app.config.get('SQLALCHEMY_REPLICA_URIS', [])
+        ]
+        self.read_routes = set(app.config.get('REPLICA_READ_ROUTES', READ_ROUTES))
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _create_engine(self, app, uri):
+        url = make_url(uri)
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        if url.get_backend_name() == 'sqlite':
+            if url.database and url.database != ':memory:':
+                # Resolve relative paths against the instance folder, as
+                # Flask-SQLAlchemy does for the primary.
+                url = url.set(database=os.path.join(app.instance_path, url.database))
+            engine = create_engine(url, **options)
+            listen_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS'))
+        else:
+            engine = create_engine(url, **options)
+
+        # Replica queries count towards /metrics and N+1 detection like
+        # queries on the primary.
+        instrumentation.watch_engine(engine)
+        nplusone.watch_engine(engine)
+        return engine
+
+    def choose(self):
+        return random.choice(self.engines)
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+        self.engines = []
+
+    def _start_request(self):
+        if not self.engines or (request.endpoint, request.method) not in self.read_routes:
+            return
+        if session.get(STICKY_KEY, 0) > time.time():
+            return
+        self.db.session.info['use_replica'] = True
+
+    def _finish_request(self, response):
+        if self.engines and self.db.session.info.get('wrote'):
+            session[STICKY_KEY] = time.time() + self.sticky_seconds
+        return response
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,84 @@
+import re
+import time
+
+from sqlalchemy import column, or_, table, text
+
+from server.loading import loader_options
+from server.models import db, Recipe
+from server.pagination import encode_offset
+
+recipes_fts = table('recipes_fts', column('rowid'))
+
+# Seconds to trust a has_fts answer, so an index created (or dropped) by a
+# migration after startup is noticed without a restart.
+FTS_CHECK_INTERVAL = 60
+
+_fts_available = {}
+
+
+def has_fts(engine):
+    """True if the FTS5 index from the search migration exists on `engine`."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    available, checked_at = _fts_available.get(engine, (False, None))
+    if checked_at is None or time.monotonic() - checked_at > FTS_CHECK_INTERVAL:
+        with engine.connect() as connection:
+            available = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+            )).first() is not None
+        _fts_available[engine] = (available, time.monotonic())
+    return available
+
+
+def search_terms(q):
+    return re.findall(r'\w+', q or '')
+
+
+def like_escape(term):
+    # `_` is a word character, so it reaches LIKE patterns as a wildcard.
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def fts_query(terms):
+    # Quote every term so user input can't use FTS5 syntax; the last term is
+    # a prefix match so results show up while the user is still typing.
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_recipes(user_id, q, limit, offset=0, use_fts=None):
+    """Return (recipes, next_cursor) for `user_id`'s recipes matching every term in `q`.
+
+    Uses the FTS5 index ranked by bm25 when it exists, otherwise a LIKE scan
+    ordered by id.
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise ValueError("Search query is required.")
+
+    if use_fts is None:
+        use_fts = has_fts(db.engine)
+
+    query = Recipe.query.options(*loader_options(Recipe)).filter(Recipe.user_id == user_id)
+    if use_fts:
+        query = (
+            query.join(recipes_fts, recipes_fts.c.rowid == Recipe.id)
+            .filter(text('recipes_fts MATCH :match').bindparams(match=fts_query(terms)))
+            .order_by(text('bm25(recipes_fts)'), Recipe.id)
+        )
+    else:
+        for term in terms:
+            pattern = '%' + like_escape(term) + '%'
+            query = query.filter(or_(
+                Recipe.title.ilike(pattern, escape='\\'),
+                Recipe.instructions.ilike(pattern, escape='\\'),
+            ))
+        query = query.order_by(Recipe.id)
+
+    rows = query.limit(limit + 1).offset(offset).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_offset(offset + limit)
+    return rows, next_cursor
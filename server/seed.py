@@ -1,50 +1,150 @@
+#!/usr/bin/env python3
+"""Seed the database with fake users and recipes.
+
+    python -m server.seed                              # 20 users, 100 recipes
+    python -m server.seed --users 1000000 --recipes 10000000 --password-mode shared
+
+Rows are written with Core executemany inserts, one transaction per chunk,
+using the bulk_load profile. With --password-mode unique every user gets the
+password "<username>password", hashed in parallel; with shared every user
+reuses one precomputed hash of "password", which is what you want at
+load-test scale.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from random import randint, choice as rc
+
 from faker import Faker
+from sqlalchemy import delete, insert
 
-from server.app import app
+from server import create_app
+from server.hashing import _hash_password, hasher
 from server.models import db, Recipe, User
 
-fake = Faker()
+MIN_INSTRUCTIONS_LENGTH = 50
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the database with fake users and recipes.")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--password-mode', choices=['unique', 'shared'], default='unique')
+    parser.add_argument('--rounds', type=int,
+                        help="bcrypt cost for seeded hashes (default: the app's, as calibrated)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--text-pool', type=int, default=1000,
+                        help="distinct fake titles/bios/instructions to sample from")
+    parser.add_argument('--profile', default='bulk_load')
+    return parser.parse_args(argv)
+
+
+def _hash_chunk(passwords, rounds):
+    return [_hash_password(p.encode('utf-8'), rounds, b'2b').decode('utf-8') for p in passwords]
+
+
+class TextPool:
+    """Pre-generated Faker text; calling Faker per row dominates at scale."""
+
+    def __init__(self, fake, size):
+        self.titles = [fake.sentence() for _ in range(size)]
+        self.bios = [fake.paragraph(nb_sentences=3) for _ in range(size)]
+        self.urls = [fake.url() for _ in range(size)]
+        self.instructions = []
+        while len(self.instructions) < size:
+            text = fake.paragraph(nb_sentences=8)
+            if len(text.strip()) >= MIN_INSTRUCTIONS_LENGTH:
+                self.instructions.append(text)
+
+
+def chunks(total, size):
+    start = 0
+    while start < total:
+        yield start, min(start + size, total)
+        start += size
+
+
+def seed_users(conn_factory, args, fake, pool, executor):
+    shared_hash = None
+    if args.password_mode == 'shared':
+        shared_hash = _hash_chunk(['password'], args.rounds)[0]
 
-with app.app_context():
-    print("Deleting all records...")
-    Recipe.query.delete()
-    User.query.delete()
+    for start, end in chunks(args.users, args.chunk_size):
+        usernames = [f"{fake.first_name()}{i + 1}" for i in range(start, end)]
 
+        if shared_hash:
+            hashes = [shared_hash] * len(usernames)
+        else:
+            passwords = [username + 'password' for username in usernames]
+            step = max(1, len(passwords) // (args.workers * 4))
+            parts = [passwords[i:i + step] for i in range(0, len(passwords), step)]
+            hashes = [h for part in executor.map(_hash_chunk, parts, [args.rounds] * len(parts)) for h in part]
+
+        rows = [
+            {
+                'id': i + 1,
+                'username': username,
+                '_password_hash': pw_hash,
+                'bio': rc(pool.bios),
+                'image_url': rc(pool.urls),
+            }
+            for i, username, pw_hash in zip(range(start, end), usernames, hashes)
+        ]
+        with conn_factory() as conn:
+            conn.execute(insert(User.__table__), rows)
+        print(f"  users {end}/{args.users}")
+
+
+def seed_recipes(conn_factory, args, pool):
+    for start, end in chunks(args.recipes, args.chunk_size):
+        rows = [
+            {
+                'id': i + 1,
+                'title': rc(pool.titles),
+                'instructions': rc(pool.instructions),
+                'minutes_to_complete': randint(15, 90),
+                'user_id': randint(1, args.users),
+            }
+            for i in range(start, end)
+        ]
+        with conn_factory() as conn:
+            conn.execute(insert(Recipe.__table__), rows)
+        print(f"  recipes {end}/{args.recipes}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.recipes and not args.users:
+        raise SystemExit("Recipes need at least one user.")
+
+    app = create_app(args.profile)
+    if args.rounds is None:
+        args.rounds = hasher.log_rounds
     fake = Faker()
-    print("Creating users...")
-
-    users = []
-    usernames = []
-
-    for i in range(20):
-        username = fake.first_name()
-        while username in usernames:
-            username = fake.first_name()
-        usernames.append(username)
-
-        user = User(
-            username=username,
-            bio=fake.paragraph(nb_sentences=3),
-            image_url=fake.url(),
-        )
-        user.password_hash = username + 'password'
-        users.append(user)
-
-    db.session.add_all(users)
-
-    print("Creating recipes...")
-    recipes = []
-    for i in range(100):
-        instructions = fake.paragraph(nb_sentences=8)
-        recipe = Recipe(
-            title=fake.sentence(),
-            instructions=instructions,
-            minutes_to_complete=randint(15, 90),
-            user=rc(users)
-        )
-        recipes.append(recipe)
-
-    db.session.add_all(recipes)
-    db.session.commit()
-    print("Complete.")
+    started = time.perf_counter()
+
+    with app.app_context():
+        conn_factory = db.engine.begin
+
+        print("Deleting all records...")
+        with conn_factory() as conn:
+            conn.execute(delete(Recipe.__table__))
+            conn.execute(delete(User.__table__))
+
+        print("Generating fake text...")
+        pool = TextPool(fake, args.text_pool)
+
+        print("Creating users...")
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            seed_users(conn_factory, args, fake, pool, executor)
+
+        print("Creating recipes...")
+        seed_recipes(conn_factory, args, pool)
+
+    print(f"Complete in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""Production entry point: a pre-fork master with N worker processes.
+
+    python -m server.serve --workers 4 --port 5555
+    kill -HUP <master pid>     # graceful reload
+    kill -TERM <master pid>    # graceful stop
+
+The master imports and builds the app once, binds the listening socket and
+forks the workers, which share both. Each worker warms its own database
+pool, serializers and bcrypt pool before accepting connections, then
+serves requests on threads. Nothing is shared between workers: the user
+cache, rate limits, username filter and /metrics are all per process, and
+/healthz reports the pid of the worker that answered. For the same reason
+the 'memory' session backend is refused with more than one worker.
+
+On SIGHUP the master starts a new set of workers and, once they are ready,
+asks the old ones to finish their in-flight requests and exit; the socket
+never closes, so no connection is refused. Workers are forked from the
+preloaded app, so a reload does not pick up code changes unless the master
+runs with --no-preload, where every worker imports the app itself.
+
+The app reads its settings from the environment as usual (APP_PROFILE,
+DATABASE_URL, ...).
+"""
+import argparse
+import importlib
+import logging
+import os
+import select
+import signal
+import sys
+import threading
+import time
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler, prepare_socket
+
+logger = logging.getLogger(__name__)
+
+# Exit status of a worker that failed before it could serve; the master
+# gives up instead of respawning it in a loop.
+BOOT_FAILED = 3
+
+
+def load_app():
+    return importlib.import_module('server.app').app
+
+
+def config_error(app, workers):
+    """Why `app` can't be served by `workers` processes, or None if it can."""
+    if workers > 1 and app.config.get('SESSION_BACKEND') == 'memory':
+        # Each worker would have its own store, so a session created by one
+        # worker is unknown to the others.
+        return "SESSION_BACKEND 'memory' needs a single worker; use 'sqlite' or 'cookie'."
+    return None
+
+
+def warm_worker(app):
+    """Per-process setup after fork, before the worker accepts connections."""
+    from sqlalchemy import text
+
+    from server.hashing import hasher
+    from server.models import db, User, Recipe
+    from server.routing import replica_router
+    from server.search import has_fts
+    from server.serializers import serializer_for
+    from server.sessions import SessionSweeper
+    from server.usernames import username_index
+
+    with app.app_context():
+        # Connections opened by the master must not be shared with it.
+        for engine in [db.engine, *replica_router.engines]:
+            engine.dispose(close=False)
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        has_fts(db.engine)
+        serializer_for(User)
+        serializer_for(Recipe)
+        if username_index.enabled and username_index.filter is None:
+            username_index.warm()
+
+    # Fork the pool's processes while this worker has no other threads: stop
+    # the sweeper its app started (with --no-preload), then start a new one.
+    sweeper = stop_sweeper(app)
+    hasher.warmup()
+
+    if sweeper is not None:
+        sweeper = SessionSweeper(sweeper.backend, sweeper.interval)
+        sweeper.start()
+        app.extensions['session_sweeper'] = sweeper
+
+
+def stop_sweeper(app):
+    """Stop the app's session sweeper thread, if it runs here; returns it."""
+    sweeper = app.extensions.get('session_sweeper')
+    if sweeper is not None and sweeper.is_alive():
+        sweeper.stop()
+        sweeper.join()
+    return sweeper
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    # Idle keep-alive connections would otherwise hold up a graceful stop.
+    timeout = 5
+
+
+class WorkerServer(ThreadedWSGIServer):
+    # Wait for request threads in server_close, so a stopping worker
+    # finishes its in-flight requests.
+    daemon_threads = False
+    block_on_close = True
+
+
+def run_worker(app, sock, ready_fd, graceful_timeout, workers):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    try:
+        if app is None:
+            app = load_app()
+            error = config_error(app, workers)
+            if error:
+                raise RuntimeError(error)
+        warm_worker(app)
+        host, port = sock.getsockname()[:2]
+        server = WorkerServer(host, port, app, handler=WorkerRequestHandler, fd=sock.fileno())
+    except Exception:
+        logger.exception("Worker %d failed to boot.", os.getpid())
+        return BOOT_FAILED
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+        deadline = threading.Timer(graceful_timeout, os._exit, (1,))
+        deadline.daemon = True
+        deadline.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        os.write(ready_fd, b'1')
+    except BrokenPipeError:
+        pass  # The master isn't waiting on this worker.
+    os.close(ready_fd)
+
+    server.serve_forever()
+
+    from server.hashing import hasher
+    from server.writebehind import group_committer
+    group_committer.stop()
+    hasher.shutdown()
+    return 0
+
+
+class Master:
+    """Keeps `workers` processes serving `sock`, replacing any that die."""
+
+    def __init__(self, sock, workers, app=None, graceful_timeout=30):
+        self.sock = sock
+        self.worker_count = workers
+        self.app = app
+        self.graceful_timeout = graceful_timeout
+
+        self.workers = {}  # pid -> generation
+        self.generation = 0
+        self.reloading = False
+        self.stopping = False
+        self.exit_code = 0
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        logger.info("Master %d listening on %s:%d", os.getpid(), *self.sock.getsockname()[:2])
+        try:
+            while not self.stopping:
+                self.reap()
+                if self.stopping:
+                    break
+                if self.reloading:
+                    self.reloading = False
+                    self.reload()
+                else:
+                    self.spawn_missing()
+                time.sleep(0.2)
+        finally:
+            self.stop()
+        return self.exit_code
+
+    def _request_reload(self, signum, frame):
+        self.reloading = True
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def spawn(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.close(read_fd)
+                status = run_worker(
+                    self.app, self.sock, write_fd, self.graceful_timeout, self.worker_count
+                )
+            except BaseException:
+                logger.exception("Worker %d crashed.", os.getpid())
+            finally:
+                # Never fall back into the master's loop.
+                logging.shutdown()
+                os._exit(status)
+
+        os.close(write_fd)
+        self.workers[pid] = self.generation
+        logger.info("Booting worker %d", pid)
+        return pid, read_fd
+
+    def spawn_missing(self):
+        current = sum(1 for generation in self.workers.values() if generation == self.generation)
+        for _ in range(self.worker_count - current):
+            _, read_fd = self.spawn()
+            os.close(read_fd)
+
+    def wait_ready(self, pending, timeout):
+        """Wait for workers to signal readiness; `pending` maps read fd to pid."""
+        ready = set()
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(list(pending), [], [], remaining)
+            for fd in readable:
+                # An empty read means the worker exited before it was ready.
+                if os.read(fd, 1):
+                    ready.add(pending[fd])
+                os.close(fd)
+                del pending[fd]
+        for fd in pending:
+            os.close(fd)
+        return ready
+
+    def reload(self):
+        old_generation = self.generation
+        self.generation += 1
+        logger.info("Reloading: starting %d new workers", self.worker_count)
+        pending = dict(
+            (read_fd, pid) for pid, read_fd in (self.spawn() for _ in range(self.worker_count))
+        )
+        new_pids = list(pending.values())
+
+        if not self.wait_ready(pending, self.graceful_timeout):
+            logger.error("Reload failed: no new worker became ready; keeping the old ones.")
+            self.generation = old_generation
+            self.signal_workers(new_pids, signal.SIGKILL)
+            return
+
+        old_pids = [pid for pid, generation in self.workers.items() if generation == old_generation]
+        self.signal_workers(old_pids, signal.SIGTERM)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            generation = self.workers.pop(pid, None)
+            code = os.waitstatus_to_exitcode(status)
+            if code == BOOT_FAILED and generation == self.generation:
+                logger.error("Worker %d failed to boot; shutting down.", pid)
+                self.stopping = True
+                self.exit_code = 1
+            elif code and not self.stopping:
+                logger.warning("Worker %d exited with status %d", pid, code)
+
+    def signal_workers(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(self):
+        """Let every worker drain, then kill any that outlive the grace period."""
+        self.signal_workers(list(self.workers), signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.signal_workers(list(self.workers), signal.SIGKILL)
+        while self.workers:
+            pid, _ = os.waitpid(-1, 0)
+            self.workers.pop(pid, None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--graceful-timeout', type=float, default=30,
+                        help="seconds a stopping worker may spend on in-flight requests")
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help="import the app in each worker, so SIGHUP also reloads code")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='[%(process)d] %(levelname)s %(message)s')
+
+    workers = max(args.workers, 1)
+    app = None
+    if args.preload:
+        app = load_app()
+        error = config_error(app, workers)
+        if error:
+            logger.error(error)
+            return 1
+        # A thread running at fork could leave a worker holding one of its
+        # locks; each worker starts its own sweeper instead.
+        stop_sweeper(app)
+
+    sock = prepare_socket(args.host, args.port)
+    # Idle workers poll the shared socket; whichever loses the race for a
+    # connection must not block in accept().
+    sock.setblocking(False)
+    master = Master(sock, workers, app, args.graceful_timeout)
+    return master.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from werkzeug.datastructures import CallbackDict
+
+from server.cache import TTLCache
+
+metadata = MetaData()
+
+sessions_table = Table(
+    'sessions', metadata,
+    Column('id', String, primary_key=True),
+    Column('data', Text, nullable=False),
+    Column('expires_at', Float, nullable=False, index=True),
+)
+
+
+def generate_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id; the old one is deleted on save."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = generate_sid()
+        self.modified = True
+
+
+def regenerate_session(session):
+    """Give a server-side session a new id when its privileges change.
+
+    Call before storing a user id in the session at login or signup, so an
+    id planted in the browser beforehand (session fixation) never becomes
+    authenticated. Signed cookie sessions carry their data in the cookie and
+    are rewritten on every change, so they need nothing.
+    """
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+# ----------------------------
+# Backends
+# ----------------------------
+class MemorySessionBackend:
+    """Sessions in an in-process LRU; the oldest sessions are evicted at `maxsize`."""
+
+    def __init__(self, maxsize=100000, ttl=86400):
+        self.store = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, sid):
+        return self.store.get(sid)
+
+    def set(self, sid, data):
+        self.store.set(sid, dict(data))
+
+    def delete(self, sid):
+        self.store.invalidate(sid)
+
+    def sweep(self):
+        return self.store.sweep()
+
+
+class SQLiteSessionBackend:
+    """Sessions in a `sessions` table, looked up by primary key."""
+
+    def __init__(self, engine, ttl=86400):
+        self.engine = engine
+        self.ttl = ttl
+        self.serializer = TaggedJSONSerializer()
+        metadata.create_all(engine, tables=[sessions_table])
+
+    def get(self, sid):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(sessions_table.c.data)
+                .where(sessions_table.c.id == sid, sessions_table.c.expires_at > time.time())
+            ).first()
+        return self.serializer.loads(row.data) if row else None
+
+    def set(self, sid, data):
+        row = {
+            'id': sid,
+            'data': self.serializer.dumps(dict(data)),
+            'expires_at': time.time() + self.ttl,
+        }
+        statement = sqlite_insert(sessions_table).values(row)
+        statement = statement.on_conflict_do_update(
+            index_elements=[sessions_table.c.id],
+            set_={'data': statement.excluded.data, 'expires_at': statement.excluded.expires_at},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(delete(sessions_table).where(sessions_table.c.id == sid))
+
+    def sweep(self):
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(sessions_table).where(sessions_table.c.expires_at <= time.time())
+            )
+        return result.rowcount
+
+
+class SessionSweeper(threading.Thread):
+    """Background thread that purges expired sessions every `interval` seconds."""
+
+    def __init__(self, backend, interval=60):
+        super().__init__(name='session-sweeper', daemon=True)
+        self.backend = backend
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.backend.sweep()
+
+    def stop(self):
+        self.stopped.set()
+
+
+# ----------------------------
+# Session interface
+# ----------------------------
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in `backend`; the cookie only carries a random id.
+
+    Deleting the stored session (e.g. on logout) revokes it immediately,
+    which signed cookie sessions cannot do.
+    """
+
+    session_class = ServerSideSession
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.backend.get(sid)
+            if data is not None:
+                return self.session_class(data, sid=sid)
+        return self.session_class(sid=generate_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid is not None:
+            self.backend.delete(session.previous_sid)
+
+        if not session:
+            if session.modified:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.modified:
+            self.backend.set(session.sid, session)
+        elif not self.should_set_cookie(app, session):
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_sessions(app, db):
+    """Install the SESSION_BACKEND ('cookie', 'memory' or 'sqlite') on `app`.
+
+    Returns the backend, or None for Flask's default signed-cookie sessions.
+    'memory' sessions live in this process only, so it needs a single worker.
+    """
+    kind = app.config.get('SESSION_BACKEND', 'cookie')
+    if kind == 'cookie':
+        return None
+
+    ttl = int(app.permanent_session_lifetime.total_seconds())
+    if kind == 'memory':
+        backend = MemorySessionBackend(app.config.get('SESSION_MAX_ENTRIES', 100000), ttl)
+    elif kind == 'sqlite':
+        with app.app_context():
+            backend = SQLiteSessionBackend(db.engine, ttl)
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND {kind!r}.")
+
+    app.session_interface = ServerSideSessionInterface(backend)
+    sweeper = SessionSweeper(backend, app.config.get('SESSION_SWEEP_INTERVAL', 60))
+    sweeper.start()
+    app.extensions['session_sweeper'] = sweeper
+    return backend
@@ -0,0 +1,138 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from server.cache import TTLCache
+from server.models import User
+
+SNAPSHOT_KEY = 'user'
+SNAPSHOT_FORMAT = 1
+
+# Latest profile_version seen per user id by this process. A snapshot
+# older than this is stale even if it is still within its max age, and one
+# for a user missing here (evicted, deleted, or cleared by a bulk write) is
+# checked against the database before it is trusted again.
+latest_versions = TTLCache(maxsize=65536, ttl=3600)
+_versions_lock = threading.Lock()
+
+
+class SessionSnapshots:
+    """Keeps a compact signed copy of the user's profile in the session cookie.
+
+    With SESSION_SNAPSHOTS enabled, /check_session and the login gate answer
+    from the snapshot without touching the database. A snapshot is trusted
+    for SESSION_SNAPSHOT_MAX_AGE seconds, as long as this process knows the
+    user's latest profile_version and it is no newer than the snapshot's;
+    otherwise it is rebuilt from the database.
+
+    That invalidation is per process: under serve.py's workers, a profile
+    change served by one worker leaves other workers trusting their
+    snapshots until SESSION_SNAPSHOT_MAX_AGE runs out, so keep it short.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.max_age = 300
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SESSION_SNAPSHOTS', False)
+        self.max_age = app.config.get('SESSION_SNAPSHOT_MAX_AGE', 300)
+
+    def store(self, session, user):
+        """Snapshot `user` into the session and return its profile dict."""
+        profile = {
+            'id': user.id,
+            'username': user.username,
+            'image_url': user.image_url,
+            'bio': user.bio,
+        }
+        if self.enabled:
+            version = user.profile_version or 0
+            session[SNAPSHOT_KEY] = dict(
+                profile,
+                f=SNAPSHOT_FORMAT,
+                v=version,
+                at=int(time.time()),
+            )
+            # Vouch for a version read from the database, unless a commit
+            # already recorded one.
+            with _versions_lock:
+                if latest_versions.get(user.id) is None:
+                    latest_versions.set(user.id, version)
+        return profile
+
+    def load(self, session):
+        """Return the profile dict from a fresh snapshot, or None."""
+        if not self.enabled:
+            return None
+        snapshot = session.get(SNAPSHOT_KEY)
+        if not snapshot or snapshot.get('f') != SNAPSHOT_FORMAT:
+            return None
+        if snapshot['id'] != session.get('user_id'):
+            return None
+        if time.time() - snapshot['at'] > self.max_age:
+            return None
+        latest = latest_versions.get(snapshot['id'])
+        if latest is None or latest > snapshot['v']:
+            return None
+        return {key: snapshot[key] for key in ('id', 'username', 'image_url', 'bio')}
+
+    def version(self, session):
+        """Return (profile_version, taken_at) of the session's snapshot."""
+        snapshot = session[SNAPSHOT_KEY]
+        return snapshot['v'], datetime.fromtimestamp(snapshot['at'], timezone.utc)
+
+    def clear(self, session):
+        session.pop(SNAPSHOT_KEY, None)
+
+
+session_snapshots = SessionSnapshots()
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+def _collect_profile_version(mapper, connection, user):
+    # Recording inserts too matters because SQLite can reuse a deleted id.
+    session = object_session(user)
+    if session is not None:
+        session.info.setdefault('profile_versions', {})[user.id] = user.profile_version or 0
+
+
+@event.listens_for(User, 'after_delete')
+def _collect_deleted_user(mapper, connection, user):
+    session = object_session(user)
+    if session is not None:
+        session.info.setdefault('profile_versions', {})[user.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_profile_versions(session):
+    # Only committed versions count; a rolled back write changed nothing.
+    with _versions_lock:
+        if session.info.pop('bulk_user_writes', False):
+            # Again, in case a snapshot vouched for a row read before this commit.
+            latest_versions.clear()
+        for user_id, version in session.info.pop('profile_versions', {}).items():
+            if version is None:
+                latest_versions.invalidate(user_id)
+            else:
+                latest_versions.set(user_id, version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_profile_versions(session):
+    session.info.pop('profile_versions', None)
+    session.info.pop('bulk_user_writes', None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _forget_bulk_user_writes(orm_execute_state):
+    # Which users changed is unknown, so every snapshot is rechecked.
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            latest_versions.clear()
+            orm_execute_state.session.info['bulk_user_writes'] = True
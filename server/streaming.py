@@ -0,0 +1,62 @@
+import json
+
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+YIELD_PER = 500
+
+
+def wants_stream():
+    if request.args.get('stream') in ('1', 'true', 'ndjson'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def wants_ndjson():
+    return (
+        request.args.get('stream') == 'ndjson'
+        or request.accept_mimetypes.best == NDJSON_MIMETYPE
+    )
+
+
+def _json_array(rows, serializer):
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield json.dumps(serializer(row))
+        else:
+            yield ',' + json.dumps(serializer(row))
+    yield ']\n'
+
+
+def _ndjson(rows, serializer):
+    for row in rows:
+        yield json.dumps(serializer(row)) + '\n'
+
+
+def _batched(chunks, size=64):
+    # Fewer, larger writes are much cheaper for the WSGI server than one per row.
+    buffer = []
+    for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_query(query, serializer):
+    """Stream `query` as a JSON array, or NDJSON if the client asked for it.
+
+    Rows are pulled from a server-side cursor in batches of YIELD_PER, so
+    memory use does not grow with the size of the result.
+    """
+    rows = query.execution_options(stream_results=True).yield_per(YIELD_PER)
+    if wants_ndjson():
+        body, mimetype = _ndjson(rows, serializer), NDJSON_MIMETYPE
+    else:
+        body, mimetype = _json_array(rows, serializer), 'application/json'
+    return Response(stream_with_context(_batched(body)), mimetype=mimetype)
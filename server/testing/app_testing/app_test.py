@@ -1,10 +1,26 @@
 from faker import Faker
 import flask
 import pytest
+import sqlalchemy
 from random import randint, choice as rc
+import gzip
+import json
+import threading
+import time
 
 from server.app import app
+from server.bulk import MAX_BULK_ITEMS
+from server.cache import profile_cache, user_cache
+from server.compression import compressor
+from server.hashing import hasher
+from server.instrumentation import instrumentation
 from server.models import db, User, Recipe
+from server.ratelimit import LoginThrottle, login_throttle
+from server import search
+from server.search import search_recipes
+from server.sessions import MemorySessionBackend, SQLiteSessionBackend, ServerSideSessionInterface, sessions_table
+from server.snapshots import latest_versions, session_snapshots
+from server.writebehind import group_committer
 
 app.secret_key = b'a\xdb\xd2\x13\x93\xc1\xe9\x97\xef2\xe3\x004U\xd1Z'
 
@@ -76,6 +92,40 @@ class TestSignup:
 
             assert(response.status_code == 422)
 
+    def test_422s_duplicate_usernames_before_hashing(self, monkeypatch):
+        '''422s a taken username at /signup without hashing the password.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            response = client.get('/signup/available?username=ashketchum')
+            assert response.get_json() == {'username': 'ashketchum', 'available': True}
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            response = client.get('/signup/available?username=ashketchum')
+            assert response.get_json()['available'] is False
+            assert client.get('/signup/available').status_code == 422
+
+            def fail(*args, **kwargs):
+                raise AssertionError("hashed a duplicate signup")
+
+            monkeypatch.setattr(hasher, 'hash_password', fail)
+            response = client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            assert response.status_code == 422
+            assert response.get_json() == {'errors': ["Username is already taken."]}
+
 class TestCheckSession:
     '''CheckSession resource in app.py'''
 
@@ -114,6 +164,138 @@ class TestCheckSession:
             assert response_json['id'] == 1
             assert response_json['username']
 
+    def test_caches_user_json_until_user_changes(self):
+        '''serves repeat session checks from the user cache and drops stale entries on writes.'''
+
+        with app.app_context():
+            
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            client.get('/check_session')
+            hits = user_cache.stats()['hits']
+            response = client.get('/check_session')
+            assert response.json['username'] == 'ashketchum'
+            assert user_cache.stats()['hits'] == hits + 1
+
+            with app.app_context():
+                user = User.query.filter(User.username == 'ashketchum').first()
+                user.bio = 'Gotta catch em all'
+                db.session.commit()
+
+            response = client.get('/check_session')
+            assert response.json['bio'] == 'Gotta catch em all'
+            etag = response.headers['ETag']
+
+            # a write this process never saw, e.g. from another worker
+            with app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(
+                        "UPDATE users SET bio = 'Pallet Town', "
+                        "change_version = change_version + 1 WHERE username = 'ashketchum'"
+                    ))
+
+            # served from the cache, validators and all, until the entry expires
+            response = client.get('/check_session', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+
+            user_cache.clear()
+            response = client.get('/check_session', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.json['bio'] == 'Pallet Town'
+            assert response.headers['ETag'] != etag
+
+            # a miss checks the validators before loading anything
+            user_cache.clear()
+            misses = user_cache.stats()['misses']
+            response = client.get('/check_session', headers={'If-None-Match': response.headers['ETag']})
+            assert response.status_code == 304
+            assert user_cache.stats()['misses'] == misses + 1
+            assert user_cache.stats()['size'] == 0
+
+    def test_answers_from_session_snapshot(self):
+        '''answers from the signed session snapshot without SQL until the profile changes.'''
+
+        with app.app_context():
+            
+            User.query.delete()
+            db.session.commit()
+
+        session_snapshots.enabled = True
+        instrumentation.enabled = True
+        try:
+            with app.test_client() as client:
+
+                client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                    'bio': 'Pallet Town',
+                })
+
+                response = client.get('/check_session')
+                assert response.json['bio'] == 'Pallet Town'
+                assert 'desc="0 queries"' in response.headers['Server-Timing']
+
+                with app.app_context():
+                    user = User.query.filter(User.username == 'ashketchum').first()
+                    user.bio = 'Gotta catch em all'
+                    db.session.commit()
+                    assert user.profile_version == 1
+
+                response = client.get('/check_session')
+                assert response.json['bio'] == 'Gotta catch em all'
+                assert 'desc="0 queries"' not in response.headers['Server-Timing']
+
+                response = client.get('/check_session')
+                assert 'desc="0 queries"' in response.headers['Server-Timing']
+
+                # a write that is rolled back leaves the snapshot fresh
+                with app.app_context():
+                    user = User.query.filter(User.username == 'ashketchum').first()
+                    user.bio = 'Never mind'
+                    db.session.flush()
+                    db.session.rollback()
+
+                response = client.get('/check_session')
+                assert response.json['bio'] == 'Gotta catch em all'
+                assert 'desc="0 queries"' in response.headers['Server-Timing']
+
+                # a bulk write names no users, so no snapshot is trusted after it
+                with app.app_context():
+                    User.query.filter(User.username == 'ashketchum').update({
+                        'bio': 'Cerulean City',
+                        'profile_version': User.profile_version + 1,
+                    })
+                    db.session.commit()
+
+                response = client.get('/check_session')
+                assert response.json['bio'] == 'Cerulean City'
+                assert 'desc="0 queries"' not in response.headers['Server-Timing']
+
+                # nor is one this process has no version for, e.g. once evicted
+                latest_versions.clear()
+                response = client.get('/check_session')
+                assert 'desc="0 queries"' not in response.headers['Server-Timing']
+                response = client.get('/check_session')
+                assert 'desc="0 queries"' in response.headers['Server-Timing']
+
+                with app.app_context():
+                    db.session.delete(User.query.filter(User.username == 'ashketchum').first())
+                    db.session.commit()
+
+                response = client.get('/check_session')
+                assert response.status_code == 401
+        finally:
+            session_snapshots.enabled = False
+            instrumentation.enabled = False
+
     def test_401s_for_no_session(self):
         '''returns a 401 Unauthorized status code if there is no active session.'''
         
@@ -185,6 +367,131 @@ class TestLogin:
             with client.session_transaction() as session:
                 assert not session.get('user_id')
 
+    def test_bad_logins_do_not_load_recipes(self):
+        '''checks the password before loading the user's recipes at /login.'''
+
+        with app.app_context():
+            
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            statements = []
+            def record(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            with app.app_context():
+                engine = db.engine
+            sqlalchemy.event.listen(engine, 'before_cursor_execute', record)
+            try:
+                response = client.post('/login', json={
+                    'username': 'ashketchum',
+                    'password': 'raichu',
+                })
+            finally:
+                sqlalchemy.event.remove(engine, 'before_cursor_execute', record)
+                login_throttle.by_username.reset('user:ashketchum')
+
+            assert response.status_code == 401
+            assert statements
+            assert not any('recipes' in statement for statement in statements)
+
+    def test_503s_when_hashing_pool_saturated(self):
+        '''returns 503 instead of queueing when the bcrypt pool is saturated.'''
+
+        with app.app_context():
+            
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            saved_slots = hasher._slots
+            hasher._slots = threading.BoundedSemaphore(1)
+            hasher._slots.acquire()
+            try:
+                response = client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+            finally:
+                hasher._slots = saved_slots
+
+            assert response.status_code == 503
+            assert response.headers.get('Retry-After')
+            assert User.query.filter(User.username == 'ashketchum').first() is None
+
+    def test_429s_repeated_bad_logins(self):
+        '''returns 429 without checking the password once a username has too many failures.'''
+
+        with app.app_context():
+            
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            try:
+                for i in range(login_throttle.by_username.limit):
+                    response = client.post('/login', json={
+                        'username': 'ashketchum',
+                        'password': 'raichu',
+                    })
+                    assert response.status_code == 401
+
+                response = client.post('/login', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                assert response.status_code == 429
+                assert int(response.headers['Retry-After']) > 0
+            finally:
+                login_throttle.by_username.reset('user:ashketchum')
+
+            response = client.post('/login', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+            assert response.status_code == 200
+
+    def test_throttle_admits_at_most_the_limit_at_once(self):
+        '''counts each login attempt as it is admitted, so a concurrent burst can't exceed the limit.'''
+
+        throttle = LoginThrottle()
+        barrier = threading.Barrier(20)
+        attempts = []
+
+        def log_in():
+            barrier.wait()
+            attempt, retry_after = throttle.reserve('ashketchum', '127.0.0.1')
+            if not retry_after:
+                attempts.append(attempt)
+
+        threads = [threading.Thread(target=log_in) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(attempts) == throttle.by_username.limit
+
+        # a success takes back its own attempt and clears the username
+        throttle.succeeded(attempts[0])
+        attempt, retry_after = throttle.reserve('ashketchum', '127.0.0.1')
+        assert retry_after == 0
+        assert throttle.by_ip.retry_after('ip:127.0.0.1') == 0
+
 class TestLogout:
     '''Logout resource in app.py'''
 
@@ -223,6 +530,110 @@ class TestLogout:
 
             assert response.status_code == 401
 
+    @pytest.mark.parametrize('backend_name', ['memory', 'sqlite'])
+    def test_logout_revokes_server_side_session(self, backend_name):
+        '''revokes a server-side session at /logout so its cookie stops working.'''
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            if backend_name == 'memory':
+                backend = MemorySessionBackend(ttl=60)
+            else:
+                backend = SQLiteSessionBackend(db.engine, ttl=60)
+
+        default_interface = app.session_interface
+        app.session_interface = ServerSideSessionInterface(backend)
+        try:
+            with app.test_client() as client:
+
+                client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                response = client.post('/login', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                cookie = response.headers['Set-Cookie'].split(';')[0]
+                sid = cookie.split('=', 1)[1]
+
+                # the cookie is an opaque id; the user id lives in the backend
+                assert 'ashketchum' not in cookie
+                assert backend.get(sid)['user_id']
+
+                client.delete('/logout')
+                assert backend.get(sid) is None
+
+            with app.test_client() as client:
+                response = client.get('/check_session', headers={'Cookie': cookie})
+                assert response.status_code == 401
+        finally:
+            app.session_interface = default_interface
+
+    def test_sweeps_expired_server_side_sessions(self):
+        '''drops expired sessions from the server-side backends when swept.'''
+        with app.app_context():
+            for backend in (MemorySessionBackend(ttl=-1), SQLiteSessionBackend(db.engine, ttl=-1)):
+                backend.set('expired', {'user_id': 1})
+                assert backend.get('expired') is None
+                backend.sweep()
+                assert backend.sweep() == 0
+
+            rows = db.session.execute(
+                db.select(sessions_table.c.id).where(sessions_table.c.id == 'expired')
+            ).all()
+            assert rows == []
+
+    @pytest.mark.parametrize('backend_name', ['memory', 'sqlite'])
+    def test_login_rotates_server_side_session_id(self, backend_name):
+        '''gives the session a new id at login so a planted session id stays anonymous.'''
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            if backend_name == 'memory':
+                backend = MemorySessionBackend(ttl=60)
+            else:
+                backend = SQLiteSessionBackend(db.engine, ttl=60)
+
+        default_interface = app.session_interface
+        app.session_interface = ServerSideSessionInterface(backend)
+        try:
+            with app.test_client() as attacker:
+                attacker.post('/signup', json={'username': 'mallory', 'password': 'secret'})
+                attacker.delete('/logout')
+                # a session the attacker holds, with nothing privileged in it
+                backend.set('planted', {'theme': 'dark'})
+
+            with app.test_client() as victim:
+                victim.set_cookie('localhost', 'session', 'planted')
+                response = victim.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                assert response.status_code == 201
+                sid = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+                assert sid != 'planted'
+                assert backend.get('planted') is None
+                assert backend.get(sid) == {'theme': 'dark', 'user_id': response.json['id']}
+
+                response = victim.post('/login', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                new_sid = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+                assert new_sid != sid
+                assert backend.get(sid) is None
+
+            with app.test_client() as attacker:
+                attacker.set_cookie('localhost', 'session', 'planted')
+                assert attacker.get('/check_session').status_code == 401
+        finally:
+            app.session_interface = default_interface
+
 class TestRecipeIndex:
     '''RecipeIndex resource in app.py'''
 
@@ -302,6 +713,45 @@ class TestRecipeIndex:
             
             assert response.status_code == 401
 
+    def test_gate_caches_profile_without_recipes(self):
+        '''lets logged in users through on a cached recipe-free profile that recipe writes keep.'''
+
+        with app.app_context():
+            
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+            client.post('/recipes', json={
+                'title': 'Poké Puffs',
+                'instructions': 'Whisk the berries into the batter and bake until golden brown.',
+                'minutes_to_complete': 30,
+            })
+
+            hits = profile_cache.stats()['hits']
+            response = client.get('/recipes')
+            assert response.status_code == 200
+            assert profile_cache.stats()['hits'] == hits + 1
+
+            with client.session_transaction() as session:
+                profile = profile_cache.get(session['user_id'])
+            assert profile['username'] == 'ashketchum'
+            assert 'recipes' not in profile
+
+            with app.app_context():
+                Recipe.query.delete()
+                User.query.delete()
+                db.session.commit()
+
+            response = client.get('/recipes')
+            assert response.status_code == 401
+
     def test_creates_recipes_with_201(self):
         '''returns a list of recipes associated with the logged in user and a 200 status code.'''
 
@@ -386,3 +836,446 @@ class TestRecipeIndex:
             })
 
             assert response.status_code == 422
+
+    def test_group_commits_concurrent_recipes(self):
+        '''coalesces concurrent recipe posts into group commits when write-behind is on.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        with app.test_client() as client:
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+            with client.session_transaction() as session:
+                user_id = session['user_id']
+
+        def post_recipe(i, responses):
+            with app.test_client() as client:
+                with client.session_transaction() as session:
+                    session['user_id'] = user_id
+                responses[i] = client.post('/recipes', json={
+                    'title': f'Recipe {i}',
+                    'instructions': 'Stir the pot slowly and keep tasting until it is completely done.',
+                    'minutes_to_complete': i,
+                })
+
+        saved = (group_committer.enabled, group_committer.max_delay)
+        group_committer.enabled = True
+        group_committer.max_delay = 0.05
+        batches = group_committer.batches
+        try:
+            responses = [None] * 20
+            threads = [threading.Thread(target=post_recipe, args=(i, responses)) for i in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with app.test_client() as client:
+                with client.session_transaction() as session:
+                    session['user_id'] = user_id
+                invalid = client.post('/recipes', json={'title': '', 'instructions': 'Nope.'})
+
+            # a committer thread that died is replaced, not waited on forever
+            group_committer._queue.put(None)
+            group_committer._thread.join()
+            revived = [None]
+            post_recipe(0, revived)
+        finally:
+            group_committer.enabled, group_committer.max_delay = saved
+            group_committer.stop()
+
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+            direct = client.post('/recipes', json={'title': '', 'instructions': 'Nope.'})
+
+        assert [response.status_code for response in responses] == [201] * 20
+        assert [response.get_json()['title'] for response in responses] == [f'Recipe {i}' for i in range(20)]
+        assert responses[0].get_json()['user']['username'] == 'Slagathor'
+        assert group_committer.batches - batches < 20
+        assert invalid.status_code == 422
+        assert invalid.get_json() == direct.get_json()
+        assert revived[0].status_code == 201
+
+        with app.app_context():
+            assert Recipe.query.filter(Recipe.user_id == user_id).count() == 21
+
+    def test_paginates_recipes_with_cursor(self):
+        '''returns pages of recipes with an opaque next_cursor when limit is given.'''
+
+        with app.app_context():
+            
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            fake = Faker()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+
+            for i in range(5):
+                db.session.add(Recipe(
+                    title=fake.sentence(),
+                    instructions=fake.paragraph(nb_sentences=8),
+                    minutes_to_complete=randint(15,90),
+                    user=user,
+                ))
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            first = client.get('/recipes?limit=3').get_json()
+            assert len(first['recipes']) == 3
+            assert first['next_cursor']
+
+            second = client.get(f"/recipes?limit=3&after={first['next_cursor']}").get_json()
+            assert len(second['recipes']) == 2
+            assert second['next_cursor'] is None
+
+            ids = [r['id'] for r in first['recipes'] + second['recipes']]
+            assert ids == sorted(ids)
+            assert len(set(ids)) == 5
+
+            response = client.get('/recipes?limit=3&after=not-a-cursor')
+            assert response.status_code == 422
+
+    def test_streams_recipes(self):
+        '''streams recipes as a JSON array or NDJSON when requested.'''
+
+        with app.app_context():
+            
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            fake = Faker()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+
+            for i in range(3):
+                db.session.add(Recipe(
+                    title=fake.sentence(),
+                    instructions=fake.paragraph(nb_sentences=8),
+                    minutes_to_complete=randint(15,90),
+                    user=user,
+                ))
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            response = client.get('/recipes?stream=1')
+            assert response.status_code == 200
+            assert response.is_streamed
+            streamed = json.loads(response.get_data(as_text=True))
+            assert streamed == client.get('/recipes').get_json()
+
+            response = client.get('/recipes', headers={'Accept': 'application/x-ndjson'})
+            assert response.mimetype == 'application/x-ndjson'
+            lines = response.get_data(as_text=True).splitlines()
+            assert [json.loads(line) for line in lines] == streamed
+
+    def test_answers_conditional_gets_with_304(self):
+        '''returns 304 for a matching ETag until the user's recipes change.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        instrumentation.enabled = True
+        try:
+            with app.test_client() as client:
+
+                client.post('/login', json={
+                    'username': 'Slagathor',
+                    'password': 'secret',
+                })
+
+                response = client.get('/recipes')
+                etag = response.headers['ETag']
+                assert response.headers['Cache-Control'] == 'private, no-cache'
+                assert response.headers['Last-Modified']
+
+                response = client.get('/recipes', headers={'If-None-Match': etag})
+                assert response.status_code == 304
+                assert response.get_data() == b''
+                assert 'desc="1 queries"' in response.headers['Server-Timing']
+
+                # other representations of the list get their own tags
+                response = client.get('/recipes?limit=5', headers={'If-None-Match': etag})
+                assert response.status_code == 200
+
+                client.post('/recipes', json={
+                    'title': 'Snapdragon Soup',
+                    'instructions': 'Simmer the snapdragons for a long while until they are soft.',
+                    'minutes_to_complete': 30,
+                })
+
+                response = client.get('/recipes', headers={'If-None-Match': etag})
+                assert response.status_code == 200
+                assert len(response.get_json()) == 1
+                assert response.headers['ETag'] != etag
+
+                response = client.get('/check_session')
+                etag = response.headers['ETag']
+                response = client.get('/check_session', headers={'If-None-Match': etag})
+                assert response.status_code == 304
+
+                with app.app_context():
+                    Recipe.query.delete()
+                    db.session.commit()
+
+                response = client.get('/check_session', headers={'If-None-Match': etag})
+                assert response.status_code == 200
+                assert response.get_json()['recipes'] == []
+        finally:
+            instrumentation.enabled = False
+
+    def test_compresses_large_responses(self):
+        '''compresses large recipe lists with the negotiated encoding and caches the result.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            fake = Faker()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+
+            for i in range(20):
+                db.session.add(Recipe(
+                    title=fake.sentence(),
+                    instructions=fake.paragraph(nb_sentences=8),
+                    minutes_to_complete=randint(15,90),
+                    user=user,
+                ))
+            db.session.commit()
+
+        compressor.cache.clear()
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            plain = client.get('/recipes')
+            assert 'Content-Encoding' not in plain.headers
+            assert 'Accept-Encoding' in plain.headers['Vary']
+
+            response = client.get('/recipes', headers={'Accept-Encoding': 'gzip'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+            assert gzip.decompress(response.get_data()) == plain.get_data()
+            assert len(response.get_data()) < len(plain.get_data())
+
+            # the compressed body is reused for the same ETag
+            hits = compressor.cache.hits
+            client.get('/recipes', headers={'Accept-Encoding': 'gzip'})
+            assert compressor.cache.hits == hits + 1
+
+            response = client.get('/recipes', headers={
+                'Accept-Encoding': 'gzip',
+                'If-None-Match': response.headers['ETag'],
+            })
+            assert response.status_code == 304
+            assert response.headers['ETag'].endswith('-gzip"')
+
+            for encoding in compressor.codecs:
+                response = client.get('/recipes', headers={'Accept-Encoding': encoding})
+                assert response.headers['Content-Encoding'] == encoding
+
+            # the cache is bounded by the size of what it holds
+            stats = compressor.stats()
+            assert 0 < stats['bytes'] <= stats['maxbytes']
+            saved_maxbytes = compressor.cache.maxbytes
+            compressor.cache.clear()
+            compressor.cache.maxbytes = len(response.get_data())
+            try:
+                for encoding in compressor.codecs:
+                    client.get('/recipes', headers={'Accept-Encoding': encoding})
+                stats = compressor.stats()
+                assert stats['bytes'] <= stats['maxbytes']
+                assert stats['evictions'] > 0
+            finally:
+                compressor.cache.maxbytes = saved_maxbytes
+                compressor.cache.clear()
+
+            # small bodies are sent as is
+            response = client.get('/recipes/search?q=nomatch', headers={'Accept-Encoding': 'gzip'})
+            assert response.get_json()['recipes'] == []
+            assert 'Content-Encoding' not in response.headers
+
+class TestRecipeSearch:
+    '''RecipeSearch resource in app.py'''
+
+    def test_searches_recipes(self):
+        '''returns the logged in user's recipes matching every search term.'''
+
+        with app.app_context():
+            
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            other = User(username="Prabhdip")
+            other.password_hash = 'secret'
+            db.session.add_all([user, other])
+
+            filler = ' Cook everything slowly over a low flame and stir often.'
+            db.session.add_all([
+                Recipe(title='Smoked Ham', instructions='Smoke the ham for hours.' + filler, user=user),
+                Recipe(title='Ham Sandwich', instructions='Slice the bread and the ham.' + filler, user=user),
+                Recipe(title='Tomato Soup', instructions='Simmer the tomatoes.' + filler, user=user),
+                Recipe(title='Other Ham', instructions='Not yours to find.' + filler, user=other),
+            ])
+            db.session.commit()
+
+            ham_ids = {r.id for r in user.recipes if 'Ham' in r.title}
+            for use_fts in (True, False):
+                recipes, _ = search_recipes(user.id, 'ham', 10, use_fts=use_fts)
+                assert {r.id for r in recipes} == ham_ids
+                recipes, _ = search_recipes(user.id, 'smoke ham', 10, use_fts=use_fts)
+                assert [r.title for r in recipes] == ['Smoked Ham']
+
+            # `_` is a word character but must not act as a LIKE wildcard
+            recipes, _ = search_recipes(user.id, 'h_m', 10, use_fts=False)
+            assert recipes == []
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            first = client.get('/recipes/search?q=ham&limit=1').get_json()
+            assert len(first['recipes']) == 1
+            second = client.get(f"/recipes/search?q=ham&limit=1&after={first['next_cursor']}").get_json()
+            assert second['next_cursor'] is None
+            titles = {r['title'] for r in first['recipes'] + second['recipes']}
+            assert titles == {'Smoked Ham', 'Ham Sandwich'}
+
+            assert client.get('/recipes/search?q=').status_code == 422
+
+    def test_notices_fts_index_created_after_startup(self, monkeypatch):
+        '''checks for the FTS index again once an earlier answer is stale.'''
+
+        with app.app_context():
+            monkeypatch.setitem(search._fts_available, db.engine, (False, time.monotonic()))
+            assert not search.has_fts(db.engine)
+
+            monkeypatch.setattr(search, 'FTS_CHECK_INTERVAL', 0)
+            assert search.has_fts(db.engine)
+
+class TestRecipeBulk:
+    '''RecipeBulk resource in app.py'''
+
+    def test_bulk_creates_recipes(self, monkeypatch):
+        '''inserts valid recipes in one batch and reports invalid ones by index.'''
+
+        with app.app_context():
+            
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        fake = Faker()
+        valid = {
+            'title': fake.sentence(),
+            'instructions': fake.paragraph(nb_sentences=8),
+            'minutes_to_complete': randint(15,90),
+        }
+        invalid = {'title': '', 'instructions': 'figure it out yourself!'}
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            response = client.post('/recipes/bulk?atomic=1', json=[valid, invalid])
+            assert response.status_code == 422
+            assert [r['status'] for r in response.json['results']] == ['skipped', 'error']
+            assert len(response.json['results'][1]['errors']) == 2
+
+            response = client.post('/recipes/bulk', json=[valid, invalid, valid])
+            assert response.status_code == 207
+            assert response.json['created'] == 2
+            assert [r['status'] for r in response.json['results']] == ['created', 'error', 'created']
+
+            ndjson = '\n'.join([json.dumps(valid), 'not json'])
+            response = client.post('/recipes/bulk', data=ndjson, content_type='application/x-ndjson')
+            assert response.status_code == 207
+            assert response.json['results'][1]['errors'] == ['Invalid JSON.']
+
+            recipes = client.get('/recipes').get_json()
+            assert len(recipes) == 3
+            assert len(client.get('/check_session').get_json()['recipes']) == 3
+
+            too_many = '\n'.join([json.dumps(valid)] * (MAX_BULK_ITEMS + 5))
+            response = client.post('/recipes/bulk', data=too_many, content_type='application/x-ndjson')
+            assert response.status_code == 413
+
+            # oversized bodies are refused before they are parsed
+            monkeypatch.setattr('server.app.MAX_BULK_BYTES', 64)
+            response = client.post('/recipes/bulk', json=[valid])
+            assert response.status_code == 413
+            assert response.get_json()['errors'] == ["Request bodies are limited to 64 bytes."]
+            assert len(client.get('/recipes').get_json()) == 3
+
+class TestHealthz:
+    '''Healthz resource in app.py'''
+
+    def test_reports_worker_health_without_a_session(self):
+        '''returns 200 with the worker's pid at /healthz without logging in.'''
+
+        with app.test_client() as client:
+
+            response = client.get('/healthz')
+            assert response.status_code == 200
+            assert response.json['status'] == 'ok'
+            assert isinstance(response.json['pid'], int)
@@ -0,0 +1,107 @@
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('aiosqlite')
+
+from starlette.testclient import TestClient
+
+from server.app import app
+from server.asgi import asgi_app
+from server.models import db, User, Recipe
+from server.sessions import SQLiteSessionBackend, ServerSideSessionInterface
+
+INSTRUCTIONS = 'Stir the pot slowly and keep tasting until it is completely done.'
+
+class TestAsgi:
+    '''ASGI entry point in asgi.py'''
+
+    def test_matches_flask_responses(self):
+        '''serves the auth and recipe endpoints with the same shapes as the Flask app.'''
+
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+        with TestClient(asgi_app) as client:
+
+            response = client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+                'bio': 'Gotta catch em all',
+            })
+            assert response.status_code == 201
+            assert response.json()['username'] == 'ashketchum'
+
+            response = client.post('/recipes', json={
+                'title': 'Pokepuffs',
+                'instructions': INSTRUCTIONS,
+                'minutes_to_complete': 20,
+            })
+            assert response.status_code == 201
+            assert response.json()['user']['username'] == 'ashketchum'
+
+            asgi_session = client.get('/check_session').json()
+            asgi_recipes = client.get('/recipes').json()
+            page = client.get('/recipes?limit=1').json()
+            assert page['recipes'] == asgi_recipes
+
+            assert client.post('/recipes', json={'title': 'Bad'}).status_code == 422
+            assert client.delete('/logout').status_code == 204
+            assert client.get('/check_session').status_code == 401
+            assert client.get('/recipes').status_code == 401
+
+            response = client.post('/login', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+            assert response.status_code == 200
+            cookie = client.cookies.get('session')
+
+        with app.test_client() as flask_client:
+            flask_client.set_cookie('localhost', 'session', cookie)
+            assert flask_client.get('/check_session').get_json() == asgi_session
+            assert flask_client.get('/recipes').get_json() == asgi_recipes
+
+    def test_shares_server_side_sessions_with_flask(self):
+        '''keeps sessions in the sqlite backend, rotating the id at login like the Flask app.'''
+
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+            backend = SQLiteSessionBackend(db.engine, ttl=60)
+
+        default_interface = app.session_interface
+        app.session_interface = ServerSideSessionInterface(backend)
+        try:
+            with TestClient(asgi_app) as client:
+
+                response = client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                assert response.status_code == 201
+                signup_sid = client.cookies.get('session')
+                assert backend.get(signup_sid) == {'user_id': response.json()['id']}
+                assert client.get('/check_session').status_code == 200
+
+                response = client.post('/login', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                assert response.status_code == 200
+                sid = client.cookies.get('session')
+                assert sid != signup_sid
+                assert backend.get(signup_sid) is None
+
+            with app.test_client() as flask_client:
+                flask_client.set_cookie('localhost', 'session', sid)
+                assert flask_client.get('/check_session').get_json()['username'] == 'ashketchum'
+
+            with TestClient(asgi_app) as client:
+                client.cookies.set('session', sid)
+                assert client.delete('/logout').status_code == 204
+                assert backend.get(sid) is None
+        finally:
+            app.session_interface = default_interface
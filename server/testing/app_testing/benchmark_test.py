@@ -0,0 +1,47 @@
+from server.benchmarks.load import compare, percentile, summarize
+from server.benchmarks.startup import forbidden_imports, measure, parse_importtime
+
+class TestBenchmarks:
+    '''Load benchmark helpers in benchmarks/load.py'''
+
+    def test_summarizes_latencies(self):
+        '''reports percentiles in milliseconds and requests per second.'''
+
+        summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, errors=0)
+
+        assert summary['requests'] == 100
+        assert summary['rps'] == 50
+        assert summary['p50_ms'] == 50
+        assert summary['p95_ms'] == 95
+        assert summary['p99_ms'] == 99
+        assert percentile([], 95) == 0.0
+
+    def test_flags_regressions(self):
+        '''flags p95, throughput and error regressions beyond the tolerance.'''
+
+        baseline = {'login': {'p95_ms': 10.0, 'rps': 100.0, 'errors': 0}}
+
+        assert compare({'login': {'p95_ms': 11.0, 'rps': 95.0, 'errors': 0}}, baseline, 0.2) == []
+        assert len(compare({'login': {'p95_ms': 13.0, 'rps': 70.0, 'errors': 1}}, baseline, 0.2)) == 3
+
+    def test_parses_importtime_output(self):
+        '''reads cumulative microseconds per module from -X importtime output.'''
+
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   alembic.util",
+            "import time:       300 |        420 | alembic",
+            "import time:      1000 |       1420 | server.app",
+        ])
+        timings = parse_importtime(output)
+
+        assert timings == {'alembic.util': 120, 'alembic': 420, 'server.app': 1420}
+        assert forbidden_imports(timings, ['alembic']) == ['alembic', 'alembic.util']
+
+    def test_app_startup_skips_migration_tooling(self):
+        '''imports server.app without Flask-Migrate, Alembic or Faker.'''
+
+        timings = measure('server.app')
+
+        assert 'server.app' in timings
+        assert forbidden_imports(timings, ['flask_migrate', 'alembic', 'faker']) == []
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import server
+from server.config import PROFILES, load_config, install_sqlite_pragmas
+
+ROOT = Path(server.__file__).resolve().parents[1]
+
+class TestConfig:
+    '''Performance profiles in config.py'''
+
+    def test_applies_sqlite_pragmas_on_connect(self, tmp_path):
+        '''runs the profile's pragmas on every new SQLite connection.'''
+
+        app = Flask(__name__)
+        load_config(app, 'throughput', f"sqlite:///{tmp_path / 'profile.db'}")
+        db = SQLAlchemy()
+        db.init_app(app)
+        install_sqlite_pragmas(app, db)
+
+        with app.app_context():
+            assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert db.session.execute(db.text('PRAGMA synchronous')).scalar() == 1
+            assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == \
+                PROFILES['throughput']['sqlite_pragmas']['busy_timeout']
+            assert db.engine.pool.size() == PROFILES['throughput']['engine_options']['pool_size']
+
+    def test_rejects_unknown_profiles(self):
+        '''raises ValueError for a profile name that does not exist.'''
+
+        with pytest.raises(ValueError):
+            load_config(Flask(__name__), 'turbo')
+
+    def test_factory_builds_no_default_app(self):
+        '''builds only the requested app from server.create_app, and the default one on first use.'''
+
+        script = (
+            "import server.app as module\n"
+            "from server import create_app\n"
+            "built = create_app()\n"
+            "assert 'app' not in vars(module)\n"
+            "from server.app import app\n"
+            "assert app is not built and app is module.app\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True
+        )
+        assert result.returncode == 0, result.stderr
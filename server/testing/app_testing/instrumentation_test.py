@@ -0,0 +1,63 @@
+import flask
+
+from server.app import app
+from server.instrumentation import instrumentation
+from server.models import db, User
+
+class TestInstrumentation:
+    '''Request instrumentation in instrumentation.py'''
+
+    def test_reports_server_timing_and_metrics(self):
+        '''adds Server-Timing headers and serves Prometheus metrics when enabled.'''
+
+        with app.app_context():
+            User.query.delete()
+            db.session.commit()
+
+        instrumentation.enabled = True
+        instrumentation.reset()
+        try:
+            with app.test_client() as client:
+
+                response = client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+                timing = response.headers['Server-Timing']
+                assert 'sql;dur=' in timing
+                assert 'bcrypt;dur=' in timing
+                assert 'total;dur=' in timing
+
+                metrics = client.get('/metrics')
+                body = metrics.get_data(as_text=True)
+                assert metrics.status_code == 200
+                assert 'app_request_duration_seconds_count{endpoint="signup",method="POST"} 1' in body
+                assert 'app_phase_seconds_total{endpoint="signup",method="POST",phase="bcrypt"}' in body
+                assert 'app_hashing_submitted' in body
+        finally:
+            instrumentation.enabled = False
+
+    def test_metrics_disabled_by_default(self):
+        '''returns 404 at /metrics unless instrumentation is enabled.'''
+
+        with app.test_client() as client:
+            assert client.get('/metrics').status_code == 404
+            assert 'Server-Timing' not in client.get('/check_session').headers
+
+    def test_times_statements_after_a_failed_one(self):
+        '''counts only completed statements when one before them fails.'''
+
+        instrumentation.enabled = True
+        try:
+            with app.test_request_context('/check_session'):
+                instrumentation._start_request()
+                try:
+                    db.session.execute(db.text('SELECT * FROM no_such_table'))
+                except Exception:
+                    db.session.rollback()
+                db.session.execute(db.text('SELECT 1'))
+
+                assert flask.g.query_count == 1
+                assert 0 <= flask.g.timings['sql'] < 1
+        finally:
+            instrumentation.enabled = False
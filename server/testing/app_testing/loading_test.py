@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import lazyload
+
+from server.app import app
+from server.loading import NPlusOneDetected, configure_loading, loader_options, statement_shape
+from server.models import db, User, Recipe
+from server.serializers import serialize_many
+
+INSTRUCTIONS = 'Stir the pot slowly and keep tasting until it is completely done.'
+
+def seed_users(count):
+    with app.app_context():
+        Recipe.query.delete()
+        User.query.delete()
+        db.session.commit()
+
+        for i in range(count):
+            user = User(username=f'trainer{i}', _password_hash='not-a-real-hash')
+            db.session.add(Recipe(title=f'Recipe {i}', instructions=INSTRUCTIONS, user=user))
+        db.session.commit()
+
+class TestLoading:
+    '''Eager loading options and N+1 detection in loading.py'''
+
+    def test_fails_requests_with_n_plus_one_queries(self):
+        '''fails a request that lazy loads one user per recipe.'''
+
+        seed_users(12)
+
+        with app.test_request_context('/recipes'):
+            app.preprocess_request()
+            recipes = Recipe.query.options(lazyload(Recipe.user)).all()
+            with pytest.raises(NPlusOneDetected):
+                serialize_many(recipes)
+
+        with app.test_request_context('/recipes'):
+            app.preprocess_request()
+            recipes = Recipe.query.options(*loader_options(Recipe)).all()
+            assert len(serialize_many(recipes)) == 12
+
+    def test_loading_is_configurable_per_endpoint(self):
+        '''applies EAGER_LOADING overrides for one endpoint only.'''
+
+        seed_users(1)
+
+        app.config['EAGER_LOADING'] = {'recipesearch': {'Recipe.user': 'raise'}}
+        try:
+            configure_loading(app)
+            with app.app_context():
+                recipe = Recipe.query.options(*loader_options(Recipe, 'recipesearch')).first()
+                with pytest.raises(InvalidRequestError):
+                    recipe.user
+
+                recipe = Recipe.query.options(*loader_options(Recipe, 'recipeindex')).first()
+                assert recipe.user.username == 'trainer0'
+        finally:
+            del app.config['EAGER_LOADING']
+            configure_loading(app)
+
+    def test_statement_shape_ignores_in_list_length(self):
+        '''treats IN lists of any length as the same statement.'''
+
+        assert statement_shape('SELECT * FROM users WHERE id IN (?, ?, ?)') == \
+            statement_shape('SELECT *  FROM users\nWHERE id IN (?)')
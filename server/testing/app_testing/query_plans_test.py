@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine
+
+from server.models import db
+from server.query_plans import find_full_scans
+
+class TestQueryPlans:
+    '''Hot-path query plan check in query_plans.py'''
+
+    def test_passes_with_indexes(self):
+        '''finds no full scans against the schema declared by the models.'''
+
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+
+        with engine.connect() as connection:
+            assert find_full_scans(connection) == {}
+
+    def test_reports_full_scans(self):
+        '''reports hot queries that scan recipes when the user_id index is missing.'''
+
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+
+        with engine.connect() as connection:
+            connection.exec_driver_sql('DROP INDEX ix_recipes_user_id_id')
+            assert 'recipes by user' in find_full_scans(connection)
@@ -0,0 +1,72 @@
+import sqlite3
+
+from server.app import app
+from server.instrumentation import instrumentation
+from server.models import db, User, Recipe
+from server.routing import replica_router
+
+INSTRUCTIONS = 'Stir the pot slowly and keep tasting until it is completely done.'
+
+class TestReplicaRouting:
+    '''Read replica routing in routing.py'''
+
+    def test_reads_from_replica_until_the_user_writes(self, tmp_path):
+        '''serves reads from a replica and pins the user to the primary after a write.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username='Slagathor')
+            user.password_hash = 'secret'
+            db.session.add(Recipe(title='Replicated', instructions=INSTRUCTIONS, user=user))
+            db.session.commit()
+
+            # A copy of the primary stands in for a replica that stops here.
+            replica_path = tmp_path / 'replica.db'
+            primary = sqlite3.connect(db.engine.url.database)
+            replica = sqlite3.connect(replica_path)
+            primary.backup(replica)
+            primary.close()
+            replica.close()
+
+            db.session.add(Recipe(title='Not replicated', instructions=INSTRUCTIONS, user_id=user.id))
+            db.session.commit()
+
+        replica_router.engines = [replica_router._create_engine(app, f'sqlite:///{replica_path}')]
+        try:
+            with app.test_client() as client:
+
+                response = client.post('/login', json={
+                    'username': 'Slagathor',
+                    'password': 'secret',
+                })
+                assert response.status_code == 200
+
+                instrumentation.enabled = True
+                response = client.get('/recipes')
+                assert [recipe['title'] for recipe in response.get_json()] == ['Replicated']
+                # replica queries are timed like queries on the primary
+                assert 'desc="0 queries"' not in response.headers['Server-Timing']
+                instrumentation.enabled = False
+
+                # a read that isn't a SELECT construct doesn't pin the user
+                with app.test_client() as anonymous:
+                    response = anonymous.get('/healthz')
+                    assert response.status_code == 200
+                    assert 'Set-Cookie' not in response.headers
+
+                response = client.post('/recipes', json={
+                    'title': 'Fresh',
+                    'instructions': INSTRUCTIONS,
+                })
+                assert response.status_code == 201
+
+                response = client.get('/recipes')
+                assert [recipe['title'] for recipe in response.get_json()] == \
+                    ['Replicated', 'Not replicated', 'Fresh']
+        finally:
+            instrumentation.enabled = False
+            replica_router.dispose()
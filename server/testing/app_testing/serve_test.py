@@ -0,0 +1,115 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+import server
+from server.app import app
+from server.hashing import hasher
+from server.serve import parse_args, warm_worker
+from server.sessions import MemorySessionBackend, SessionSweeper
+
+ROOT = Path(server.__file__).resolve().parents[1]
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def healthz(port):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/healthz', timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+
+def wait_for_workers(port, count, exclude=(), timeout=30):
+    '''Polls /healthz until `count` workers not in `exclude` have answered.'''
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, body = healthz(port)
+        except OSError:
+            time.sleep(0.1)
+            continue
+        # Every request is answered, even while workers are being replaced.
+        assert status == 200
+        if body['pid'] not in exclude:
+            pids.add(body['pid'])
+        if len(pids) == count:
+            return pids
+        time.sleep(0.05)
+    raise AssertionError(f"only saw workers {pids}")
+
+
+class TestServe:
+    '''Pre-fork server in serve.py'''
+
+    def test_parses_arguments(self):
+        '''defaults to one worker per CPU with the app preloaded.'''
+
+        args = parse_args([])
+        assert args.workers == (os.cpu_count() or 1)
+        assert args.preload
+        assert not parse_args(['--no-preload']).preload
+
+    def test_reloads_workers_on_sighup(self):
+        '''serves from several workers, replaces them on SIGHUP and exits cleanly on SIGTERM.'''
+
+        port = free_port()
+        master = subprocess.Popen(
+            [sys.executable, '-m', 'server.serve', '--workers', '2', '--port', str(port)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            old_pids = wait_for_workers(port, 2)
+            assert master.pid not in old_pids
+
+            master.send_signal(signal.SIGHUP)
+            new_pids = wait_for_workers(port, 2, exclude=old_pids)
+
+            # The old workers stop accepting once the new ones are ready.
+            time.sleep(1)
+            assert {healthz(port)[1]['pid'] for _ in range(6)} <= new_pids
+
+            master.send_signal(signal.SIGTERM)
+            assert master.wait(timeout=30) == 0
+        finally:
+            if master.poll() is None:
+                master.kill()
+                master.wait()
+
+    def test_warms_bcrypt_pool_before_starting_threads(self, monkeypatch):
+        '''forks the bcrypt pool with no sweeper thread running, then restarts the sweeper.'''
+
+        running = []
+        monkeypatch.setattr(
+            hasher, 'warmup', lambda: running.extend(t.name for t in threading.enumerate())
+        )
+        sweeper = SessionSweeper(MemorySessionBackend(), interval=60)
+        sweeper.start()
+        monkeypatch.setitem(app.extensions, 'session_sweeper', sweeper)
+
+        warm_worker(app)
+
+        restarted = app.extensions['session_sweeper']
+        try:
+            assert 'session-sweeper' not in running
+            assert not sweeper.is_alive()
+            assert restarted is not sweeper and restarted.is_alive()
+        finally:
+            restarted.stop()
+            restarted.join()
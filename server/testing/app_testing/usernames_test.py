@@ -0,0 +1,80 @@
+from server.app import app
+from server.models import db, User
+from server.usernames import BloomFilter, UsernameIndex, username_index
+
+class TestUsernameIndex:
+    '''Username Bloom filter in usernames.py'''
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        '''finds every added item and few that weren't added.'''
+
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'user{i}')
+
+        assert all(bloom.might_contain(f'user{i}') for i in range(1000))
+        false_positives = sum(bloom.might_contain(f'other{i}') for i in range(10000))
+        assert false_positives < 300
+
+    def test_warms_from_users_table(self):
+        '''rebuilds the filter from users.username and checks hits against the table.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+            username_index.warm()
+
+            db.session.execute(User.__table__.insert(), [
+                {'username': 'misty', '_password_hash': 'not-a-real-hash'},
+            ])
+            db.session.commit()
+
+            # Core inserts skip the ORM events that keep the filter current.
+            assert not username_index.might_exist('misty')
+            assert not username_index.probably_taken('misty')
+            assert username_index.exists('misty')
+
+            with app.test_client() as client:
+                response = client.get('/signup/available?username=misty')
+                assert response.get_json()['available'] is False
+
+            username_index.warm()
+            assert username_index.might_exist('misty')
+            assert username_index.probably_taken('misty')
+
+            User.query.delete()
+            db.session.commit()
+            assert not username_index.exists('misty')
+
+    def test_warms_on_first_use_and_rebuilds_past_capacity(self):
+        '''builds the filter on first check, not with the app, and rebuilds it once full.'''
+
+        index = UsernameIndex()
+        app.config['USERNAME_FILTER_CAPACITY'] = 2
+        try:
+            index.init_app(app)
+        finally:
+            del app.config['USERNAME_FILTER_CAPACITY']
+        assert index.filter is None
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            assert not index.might_exist('misty')
+            assert index.filter.capacity == 2
+
+            for username in ('misty', 'brock', 'gary'):
+                db.session.add(User(username=username, _password_hash='not-a-real-hash'))
+                index.add(username)
+            db.session.commit()
+            assert index.filter is None
+
+            assert index.might_exist('gary')
+            assert index.filter.capacity == 6
+            assert index.filter.count == 3
+
+            User.query.delete()
+            db.session.commit()
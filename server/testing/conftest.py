@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+import os
+
+# Fail any request that runs one statement in a loop; see server/loading.py.
+os.environ.setdefault('APP_DETECT_NPLUSONE', '1')
+
 def pytest_itemcollected(item):
     par = item.parent.obj
     node = item.obj
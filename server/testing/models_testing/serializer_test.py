@@ -0,0 +1,35 @@
+from server.app import app
+from server.models import db, User, Recipe
+from server.serializers import serialize, serialize_many
+
+class TestSerializers:
+    '''Compiled serializers in serializers.py'''
+
+    def test_matches_to_dict(self):
+        '''produces the same dicts as SerializerMixin.to_dict for users and recipes.'''
+
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="ChefHam", bio="Ham enthusiast")
+            user.password_hash = "hashedpass"
+            user.recipes.extend([
+                Recipe(
+                    title="Delicious Shed Ham",
+                    instructions="These are detailed cooking instructions that are long enough to pass.",
+                    minutes_to_complete=60,
+                ),
+                Recipe(
+                    title="Hasty Party Ham",
+                    instructions="Another long set of instructions that are long enough to pass.",
+                ),
+            ])
+            db.session.add(user)
+            db.session.commit()
+
+            assert serialize(user) == user.to_dict()
+            assert '_password_hash' not in serialize(user)
+            assert serialize_many(user.recipes) == [r.to_dict() for r in user.recipes]
+            assert 'recipes' not in serialize(user.recipes[0])['user']
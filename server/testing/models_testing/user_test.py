@@ -1,7 +1,10 @@
+import threading
+
 import pytest
 from sqlalchemy.exc import IntegrityError
 
 from server.app import app
+from server.hashing import hasher, HashingService, HashingPoolSaturated
 from server.models import db, User, Recipe
 
 class TestUser:
@@ -103,3 +106,51 @@ class TestUser:
             assert recipe_2.id
             assert recipe_1 in user.recipes
             assert recipe_2 in user.recipes
+
+    def test_rehashes_outdated_cost_on_authenticate(self):
+        '''rehashes passwords stored with a different bcrypt cost on login.'''
+
+        with app.app_context():
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Ben")
+            user._password_hash = hasher.hash_password("pass123", rounds=4)
+            db.session.add(user)
+            db.session.commit()
+
+            assert hasher.needs_rehash(user._password_hash)
+            assert not user.authenticate("wrongpass")
+            assert user._password_hash.split('$')[2] == '04'
+
+            assert user.authenticate("pass123")
+            assert not hasher.needs_rehash(user._password_hash)
+            assert user.authenticate("pass123")
+
+    def test_calibrates_cost_to_target_latency(self):
+        '''chooses the minimum cost when no cost fits the latency budget.'''
+
+        saved_rounds = hasher.log_rounds
+        try:
+            assert hasher.calibrate(0, min_rounds=4, max_rounds=6) == 4
+            assert hasher.log_rounds == 4
+        finally:
+            hasher.log_rounds = saved_rounds
+
+    def test_503s_hashes_that_outlast_the_timeout(self):
+        '''raises HashingPoolSaturated on timeout and frees the slot only when the job ends.'''
+
+        service = HashingService()
+        service.pool_size = 1
+        service.timeout = 0.001
+        service._slots = threading.BoundedSemaphore(1)
+        try:
+            with pytest.raises(HashingPoolSaturated):
+                service.hash_password("pass123", rounds=12)
+            assert service.metrics()['timed_out'] == 1
+            # the pool is still busy with the abandoned hash
+            assert not service._slots.acquire(blocking=False)
+        finally:
+            service.shutdown()
+
+        assert service._slots.acquire(blocking=False)
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import math
+import threading
+
+from sqlalchemy import event, exists, select
+from sqlalchemy.exc import OperationalError
+
+from server.models import db, User
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    `might_contain` never returns False for an added item, and returns True
+    for an item that wasn't added with probability about `error_rate` while
+    fewer than `capacity` items have been added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest.
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UsernameIndex:
+    """In-memory Bloom filter of every username, to skip work for duplicates.
+
+    A miss means the username is free as far as this process knows, so
+    /signup can go straight to hashing; a hit is confirmed with an indexed
+    lookup. Users created by other processes or by Core inserts are missing
+    from the filter, so a miss is only good for skipping that lookup ahead
+    of the unique constraint, which stays the source of truth. Deleted
+    usernames stay in the filter and just cost a lookup.
+
+    The filter is built from the users table on first use (serve.py builds
+    it before a worker takes traffic), not when the app is created, and is
+    rebuilt at twice the size once more than `capacity` names were added.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.capacity = 100000
+        self.error_rate = 0.01
+        self.filter = None
+        self._needs_warm = False
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USERNAME_FILTER', True)
+        self.capacity = app.config.get('USERNAME_FILTER_CAPACITY', 100000)
+        self.error_rate = app.config.get('USERNAME_FILTER_ERROR_RATE', 0.01)
+        self.filter = None
+        self._needs_warm = self.enabled
+
+    def warm(self):
+        """Rebuild the filter from users.username."""
+        self._needs_warm = False
+        try:
+            count = db.session.execute(select(db.func.count(User.id))).scalar()
+            bloom = BloomFilter(max(self.capacity, count * 2), self.error_rate)
+            for username in db.session.execute(
+                select(User.username).execution_options(yield_per=10000)
+            ).scalars():
+                bloom.add(username)
+        except OperationalError:
+            # Not migrated yet; every check falls through to the database.
+            logger.warning("users table is missing; username filter disabled until warmed.")
+            db.session.rollback()
+            return
+        with self._lock:
+            self.filter = bloom
+
+    def add(self, username):
+        if self.filter is None or not username:
+            return
+        with self._lock:
+            if self.filter is None:
+                return
+            self.filter.add(username)
+            if self.filter.count > self.filter.capacity:
+                # Past capacity the false positive rate climbs; rebuild.
+                self.filter = None
+                self._needs_warm = True
+
+    def might_exist(self, username):
+        if self._needs_warm:
+            with self._warm_lock:
+                if self._needs_warm:
+                    self.warm()
+        bloom = self.filter
+        if bloom is None:
+            return True
+        return bloom.might_contain(username)
+
+    def exists(self, username):
+        """True if `username` is taken, per the users table."""
+        return db.session.execute(select(exists().where(User.username == username))).scalar()
+
+    def probably_taken(self, username):
+        """Like `exists`, but a filter miss answers False without querying.
+
+        A filter hit is never final: it is confirmed with `exists`. Only for
+        skipping work ahead of the unique constraint, as /signup does.
+        """
+        return self.might_exist(username) and self.exists(username)
+
+
+username_index = UsernameIndex()
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+def _index_username(mapper, connection, user):
+    # Adding on a rolled-back insert only costs a false positive.
+    username_index.add(user.username)